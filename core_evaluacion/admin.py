@@ -1,5 +1,7 @@
+from django import forms
 from django.contrib import admin
 from .models import Profesor, Curso, Pregunta, FormularioEvaluacion, Evaluacion, Respuesta
+from .validacion import esquema_pregunta
 
 @admin.register(Profesor)
 class ProfesorAdmin(admin.ModelAdmin):
@@ -17,9 +19,9 @@ class CursoAdmin(admin.ModelAdmin):
 
 @admin.register(Pregunta)
 class PreguntaAdmin(admin.ModelAdmin):
-    list_display = ('texto', 'tipo_pregunta')
+    list_display = ('texto', 'tipo_pregunta', 'es_obligatoria')
     search_fields = ('texto',)
-    list_filter = ('tipo_pregunta',)
+    list_filter = ('tipo_pregunta', 'es_obligatoria')
 
 @admin.register(FormularioEvaluacion)
 class FormularioEvaluacionAdmin(admin.ModelAdmin):
@@ -28,8 +30,49 @@ class FormularioEvaluacionAdmin(admin.ModelAdmin):
     list_filter = ('esta_activo',)
     filter_horizontal = ('preguntas',) # Facilita la selección de muchas preguntas
 
+class RespuestaForm(forms.ModelForm):
+    # Respuesta guarda un valor compacto; el admin sigue editando los campos respuesta_* de siempre
+    respuesta_texto = forms.CharField(required=False, widget=forms.Textarea(attrs={'rows': 2}), label='Respuesta de Texto')
+    respuesta_calificacion = forms.IntegerField(required=False, label='Respuesta de Calificación')
+    respuesta_booleana = forms.NullBooleanField(required=False, label='Respuesta Booleana')
+    respuesta_seleccion = forms.CharField(required=False, max_length=255, label='Respuesta de Selección')
+    respuesta_multiples_selecciones = forms.JSONField(required=False, label='Respuestas de Múltiple Selección')
+
+    campos_respuesta = ('respuesta_texto', 'respuesta_calificacion', 'respuesta_booleana', 'respuesta_seleccion', 'respuesta_multiples_selecciones')
+
+    class Meta:
+        model = Respuesta
+        fields = ('pregunta',)
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        if self.instance.pk:
+            for campo in self.campos_respuesta:
+                self.initial[campo] = getattr(self.instance, campo)
+
+    def _valores(self):
+        # Los campos de texto vacíos llegan como '': se guardan como respuesta vacía
+        valores = {campo: self.cleaned_data.get(campo) for campo in self.campos_respuesta}
+        return {campo: None if valor == '' else valor for campo, valor in valores.items()}
+
+    def clean(self):
+        # Mismas reglas que un envío por la API: campo según el tipo de la pregunta, rango y obligatoriedad
+        cleaned_data = super().clean()
+        pregunta = cleaned_data.get('pregunta')
+        if pregunta is not None:
+            errores = esquema_pregunta(pregunta).validar([{'pregunta_id': pregunta.id, **self._valores()}])
+            for campo, mensajes in errores.get('respuestas', [{}])[0].items():
+                for mensaje in mensajes:
+                    self.add_error(campo, mensaje)
+        return cleaned_data
+
+    def save(self, commit=True):
+        self.instance.asignar_respuesta(**self._valores())
+        return super().save(commit)
+
 class RespuestaInline(admin.TabularInline):
     model = Respuesta
+    form = RespuestaForm
     extra = 1 # Muestra un campo extra para añadir una nueva respuesta al editar una evaluación
     fields = ('pregunta', 'respuesta_texto', 'respuesta_calificacion', 'respuesta_booleana', 'respuesta_seleccion', 'respuesta_multiples_selecciones')
     raw_id_fields = ('pregunta',) # Para buscar preguntas por ID
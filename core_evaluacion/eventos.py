@@ -0,0 +1,205 @@
+"""
+Feed en vivo del dashboard de coordinadores (Server-Sent Events).
+
+Cuando se crea una evaluación, `CanalDashboard.publicar_evaluacion` actualiza en memoria los
+conteos y promedios acumulados del profesor y del curso, arma el mensaje una sola vez y lo
+reparte a todos los dashboards conectados. Así, N dashboards cuestan una actualización por
+evaluación en lugar de N consultas de reportes en bucle.
+
+El estado es por proceso y se inicializa con consultas agregadas cuando se conecta el primer
+dashboard. La carga se hace fuera del lock, para no frenar los envíos; las evaluaciones
+publicadas mientras tanto se guardan aparte y se concilian por ID al terminar. Los mensajes
+llevan valores absolutos, por lo que perder uno no desincroniza al cliente.
+"""
+import asyncio
+import datetime
+import json
+import threading
+
+from asgiref.sync import sync_to_async
+from django.db.models import Count, Q, Sum
+from django.utils import timezone
+
+from .models import Evaluacion
+
+INTERVALO_PING = 15 # Segundos entre comentarios keep-alive
+MAX_PENDIENTES = 100 # Mensajes en cola por dashboard antes de descartar los más antiguos
+CALIFICACION = Q(respuestas__pregunta__tipo_pregunta='calificacion')
+# Las evaluaciones enviadas en esta ventana se cargan una por una para conciliarlas por ID con
+# las publicadas durante la carga; debe superar la duración de la transacción de un envío
+VENTANA_CONCILIACION = datetime.timedelta(minutes=5)
+
+
+def formatear_evento(tipo, datos):
+    return f"event: {tipo}\ndata: {json.dumps(datos, default=str)}\n\n"
+
+
+class Acumulado:
+    __slots__ = ('evaluaciones', 'suma', 'calificaciones')
+
+    def __init__(self, evaluaciones=0, suma=0, calificaciones=0):
+        self.evaluaciones = evaluaciones
+        self.suma = suma
+        self.calificaciones = calificaciones
+
+    def sumar(self, suma, calificaciones):
+        self.evaluaciones += 1
+        self.suma += suma
+        self.calificaciones += calificaciones
+
+    def como_dict(self, id):
+        promedio = self.suma / self.calificaciones if self.calificaciones else 0.0
+        return {'id': id, 'total_evaluaciones': self.evaluaciones, 'promedio_calificacion': round(promedio, 2)}
+
+
+class Suscripcion:
+    def __init__(self, loop):
+        self.loop = loop
+        self.cola = asyncio.Queue(maxsize=MAX_PENDIENTES)
+        self.activa = True
+
+    def encolar(self, mensaje):
+        # Se ejecuta en el event loop del dashboard; si va atrasado se descarta lo más antiguo
+        if self.cola.full():
+            self.cola.get_nowait()
+        self.cola.put_nowait(mensaje)
+
+
+class CanalDashboard:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._suscripciones = set()
+        self._profesores = None
+        self._cursos = None
+        self._carga = None # threading.Event mientras un dashboard carga el estado inicial
+        self._pendientes = [] # Evaluaciones publicadas durante la carga
+
+    @staticmethod
+    def _agregar(evaluaciones, campo):
+        filas = evaluaciones.values(campo).annotate(
+            evaluaciones=Count('id', distinct=True),
+            suma=Sum('respuestas__valor', filter=CALIFICACION),
+            calificaciones=Count('respuestas__valor', filter=CALIFICACION),
+        )
+        return {f[campo]: Acumulado(f['evaluaciones'], f['suma'] or 0, f['calificaciones']) for f in filas}
+
+    @classmethod
+    def _cargar(cls):
+        """Devuelve los acumulados por profesor y por curso, y los IDs de evaluaciones recientes contadas."""
+        desde = timezone.now() - VENTANA_CONCILIACION
+        anteriores = Evaluacion.objects.filter(fecha_envio__lt=desde)
+        profesores = cls._agregar(anteriores, 'profesor_id')
+        cursos = cls._agregar(anteriores, 'curso_id')
+        recientes = Evaluacion.objects.filter(fecha_envio__gte=desde).annotate(
+            suma=Sum('respuestas__valor', filter=CALIFICACION),
+            calificaciones=Count('respuestas__valor', filter=CALIFICACION),
+        ).values_list('id', 'profesor_id', 'curso_id', 'suma', 'calificaciones')
+        contadas = set()
+        for id, profesor_id, curso_id, suma, calificaciones in recientes:
+            contadas.add(id)
+            profesores.setdefault(profesor_id, Acumulado()).sumar(suma or 0, calificaciones)
+            cursos.setdefault(curso_id, Acumulado()).sumar(suma or 0, calificaciones)
+        return profesores, cursos, contadas
+
+    def _estado(self):
+        return {
+            'profesores': [a.como_dict(id) for id, a in self._profesores.items()],
+            'cursos': [a.como_dict(id) for id, a in self._cursos.items()],
+        }
+
+    def _aplicar(self, profesor_id, curso_id, calificaciones):
+        actualizados = []
+        for acumulados, id in ((self._profesores, profesor_id), (self._cursos, curso_id)):
+            acumulado = acumulados.setdefault(id, Acumulado())
+            acumulado.sumar(sum(calificaciones), len(calificaciones))
+            actualizados.append(acumulado.como_dict(id))
+        return actualizados
+
+    def suscribir(self, loop):
+        """Registra un dashboard. Devuelve la suscripción y el mensaje con el estado actual."""
+        suscripcion = Suscripcion(loop)
+        with self._lock:
+            self._suscripciones.add(suscripcion)
+        try:
+            while True:
+                with self._lock:
+                    if self._profesores is not None:
+                        return suscripcion, formatear_evento('estado', self._estado())
+                    carga = self._carga
+                    if carga is None:
+                        carga = self._carga = threading.Event()
+                        cargar = True
+                    else:
+                        cargar = False
+                if cargar:
+                    self._completar_carga(carga)
+                else:
+                    carga.wait() # Otro dashboard está cargando el estado
+        except BaseException:
+            self.desuscribir(suscripcion)
+            raise
+
+    def _completar_carga(self, carga):
+        try:
+            profesores, cursos, contadas = self._cargar()
+            with self._lock:
+                self._profesores, self._cursos = profesores, cursos
+                for evaluacion_id, profesor_id, curso_id, calificaciones in self._pendientes:
+                    if evaluacion_id not in contadas: # Las ya contadas por la consulta no se suman dos veces
+                        self._aplicar(profesor_id, curso_id, calificaciones)
+        finally:
+            with self._lock:
+                self._pendientes = []
+                self._carga = None
+            carga.set()
+
+    def desuscribir(self, suscripcion):
+        suscripcion.activa = False
+        with self._lock:
+            self._suscripciones.discard(suscripcion)
+            if not self._suscripciones and self._carga is None:
+                # Sin dashboards conectados no se mantiene el estado; el próximo lo vuelve a cargar
+                self._profesores = self._cursos = None
+
+    def publicar_evaluacion(self, evaluacion_id, profesor_id, curso_id, calificaciones):
+        """Se llama (desde cualquier hilo) una vez confirmada la creación de una evaluación."""
+        with self._lock:
+            if not self._suscripciones:
+                return
+            if self._profesores is None:
+                # El estado se está cargando: se concilia al terminar (ver _completar_carga)
+                self._pendientes.append((evaluacion_id, profesor_id, curso_id, calificaciones))
+                return
+            profesor, curso = self._aplicar(profesor_id, curso_id, calificaciones)
+            mensaje = formatear_evento('evaluacion', {
+                'evaluacion_id': evaluacion_id,
+                'profesor': profesor,
+                'curso': curso,
+            })
+            suscripciones = list(self._suscripciones)
+
+        for suscripcion in suscripciones:
+            if not suscripcion.activa:
+                continue
+            try:
+                suscripcion.loop.call_soon_threadsafe(suscripcion.encolar, mensaje)
+            except RuntimeError: # El event loop del dashboard ya se cerró
+                self.desuscribir(suscripcion)
+
+    async def flujo(self):
+        """Iterador asíncrono de mensajes SSE para StreamingHttpResponse."""
+        suscripcion, estado = await sync_to_async(self.suscribir)(asyncio.get_running_loop())
+        try:
+            yield estado
+            while True:
+                try:
+                    yield await asyncio.wait_for(suscripcion.cola.get(), timeout=INTERVALO_PING)
+                except asyncio.TimeoutError:
+                    yield ": ping\n\n"
+        finally:
+            # No se toma el lock en el event loop: la baja se completa en un hilo aparte
+            suscripcion.activa = False
+            asyncio.get_running_loop().run_in_executor(None, self.desuscribir, suscripcion)
+
+
+canal_dashboard = CanalDashboard()
@@ -0,0 +1,384 @@
+"""
+Importación masiva de profesores, cursos, preguntas y formularios.
+
+Los archivos (CSV con encabezado o JSON Lines, un objeto por línea) se leen fila a fila
+y se guardan en lotes de tamaño fijo, así la memoria no crece con el tamaño del archivo.
+Cada lote hace un "upsert": actualiza las filas que ya existen y crea las nuevas.
+
+Claves usadas para identificar filas existentes:
+    profesores  -> id_empleado (y username para el User asociado)
+    cursos      -> codigo
+    preguntas   -> texto
+    formularios -> titulo
+"""
+import csv
+import json
+from dataclasses import dataclass, field
+
+from django.contrib.auth.models import User
+from django.db import DatabaseError, transaction
+
+from .models import Profesor, Curso, Pregunta, FormularioEvaluacion
+from .validacion import invalidar_esquemas
+
+TAMANO_LOTE = 500
+MAX_ERRORES_DETALLADOS = 1000 # Evita que el reporte de errores crezca sin límite
+FORMATOS = ('csv', 'json')
+MAX_ID = 2 ** 63 - 1 # Mayor valor de una clave primaria (BigAutoField)
+
+
+class ErrorFila(Exception):
+    """Error de validación o de guardado de una fila concreta del archivo."""
+
+
+@dataclass
+class ResultadoImportacion:
+    procesadas: int = 0
+    creadas: int = 0
+    actualizadas: int = 0
+    total_errores: int = 0
+    errores: list = field(default_factory=list)
+
+    def registrar_error(self, linea, mensaje):
+        self.total_errores += 1
+        if len(self.errores) < MAX_ERRORES_DETALLADOS:
+            self.errores.append({'linea': linea, 'error': mensaje})
+
+    def como_dict(self):
+        return {
+            'procesadas': self.procesadas,
+            'creadas': self.creadas,
+            'actualizadas': self.actualizadas,
+            'total_errores': self.total_errores,
+            'errores': self.errores,
+        }
+
+
+def leer_filas(archivo, formato):
+    """
+    Genera tuplas (numero_linea, fila) a partir de un archivo de texto.
+    Si una línea no se puede interpretar, `fila` es una instancia de ErrorFila.
+    """
+    if formato == 'csv':
+        lector = csv.DictReader(archivo)
+        for fila in lector:
+            yield lector.line_num, fila
+    elif formato == 'json':
+        for numero, linea in enumerate(archivo, start=1):
+            linea = linea.strip()
+            if not linea:
+                continue
+            try:
+                fila = json.loads(linea)
+            except json.JSONDecodeError as e:
+                yield numero, ErrorFila(f"JSON inválido: {e}")
+                continue
+            if not isinstance(fila, dict):
+                yield numero, ErrorFila("Cada línea debe ser un objeto JSON.")
+                continue
+            yield numero, fila
+    else:
+        raise ValueError(f"Formato no soportado: {formato}. Usa uno de {', '.join(FORMATOS)}.")
+
+
+def _texto(fila, campo, requerido=False, modelo=None, campo_modelo=None):
+    """
+    Lee un valor de texto (o entero, que se convierte). Si se indica `modelo`, valida el
+    max_length de `campo_modelo` (por defecto, el campo del mismo nombre).
+    """
+    valor = fila.get(campo)
+    # En JSON Lines puede llegar cualquier valor: listas u objetos no son claves válidas
+    if isinstance(valor, bool) or not isinstance(valor, (str, int, type(None))):
+        raise ErrorFila(f"El campo '{campo}' debe ser texto, no {type(valor).__name__}.")
+    if isinstance(valor, int):
+        valor = str(valor)
+    elif isinstance(valor, str):
+        valor = valor.strip()
+    if requerido and valor in (None, ''):
+        raise ErrorFila(f"El campo '{campo}' es obligatorio.")
+    if modelo is not None and valor:
+        max_length = modelo._meta.get_field(campo_modelo or campo).max_length
+        if max_length and len(valor) > max_length:
+            raise ErrorFila(f"El campo '{campo}' admite como máximo {max_length} caracteres.")
+    return valor
+
+
+def _booleano(valor):
+    if isinstance(valor, bool):
+        return valor
+    if str(valor).strip().lower() in ('1', 'true', 'si', 'sí', 'verdadero'):
+        return True
+    if str(valor).strip().lower() in ('0', 'false', 'no', 'falso'):
+        return False
+    raise ErrorFila(f"Valor booleano inválido: {valor!r}")
+
+
+class Importador:
+    """
+    Lógica común: normaliza cada fila, agrupa en lotes y guarda cada lote en una transacción.
+    Si un lote falla, se reintenta fila a fila para reportar exactamente qué filas tienen errores.
+    """
+    clave = None
+
+    def __init__(self, tamano_lote=TAMANO_LOTE, progreso=None):
+        self.tamano_lote = tamano_lote
+        self.progreso = progreso # Callable que recibe el ResultadoImportacion tras cada lote
+
+    def normalizar(self, fila):
+        raise NotImplementedError
+
+    def guardar_lote(self, datos):
+        """Guarda una lista de filas normalizadas. Devuelve (creadas, actualizadas)."""
+        raise NotImplementedError
+
+    def importar(self, filas):
+        resultado = ResultadoImportacion()
+        lote = []
+        for numero, fila in filas:
+            resultado.procesadas += 1
+            if isinstance(fila, ErrorFila):
+                resultado.registrar_error(numero, str(fila))
+                continue
+            try:
+                lote.append((numero, self.normalizar(fila)))
+            except ErrorFila as e:
+                resultado.registrar_error(numero, str(e))
+            if len(lote) >= self.tamano_lote:
+                self._procesar_lote(lote, resultado)
+                lote = []
+        if lote:
+            self._procesar_lote(lote, resultado)
+        return resultado
+
+    def _procesar_lote(self, lote, resultado):
+        # Si la misma clave aparece varias veces en el lote, gana la última fila
+        unicas = {}
+        for numero, datos in lote:
+            unicas[datos[self.clave]] = (numero, datos)
+        lote = list(unicas.values())
+
+        try:
+            with transaction.atomic():
+                creadas, actualizadas = self.guardar_lote([datos for _, datos in lote])
+        except (DatabaseError, OverflowError, ErrorFila):
+            creadas = actualizadas = 0
+            for numero, datos in lote:
+                try:
+                    with transaction.atomic():
+                        c, a = self.guardar_lote([datos])
+                except (DatabaseError, OverflowError, ErrorFila) as e:
+                    resultado.registrar_error(numero, str(e))
+                    continue
+                creadas += c
+                actualizadas += a
+
+        resultado.creadas += creadas
+        resultado.actualizadas += actualizadas
+        if self.progreso:
+            self.progreso(resultado)
+
+    @staticmethod
+    def _upsert(modelo, existentes, nuevos, campos):
+        modelo.objects.bulk_create(nuevos)
+        if existentes and campos:
+            modelo.objects.bulk_update(existentes, campos)
+        return len(nuevos), len(existentes)
+
+
+class ProfesorImportador(Importador):
+    clave = 'id_empleado'
+    campos_usuario = ('first_name', 'last_name', 'email')
+
+    def normalizar(self, fila):
+        datos = {
+            'username': _texto(fila, 'username', requerido=True, modelo=User),
+            'id_empleado': _texto(fila, 'id_empleado', requerido=True, modelo=Profesor),
+            'departamento': _texto(fila, 'departamento', requerido=True, modelo=Profesor),
+        }
+        for campo in self.campos_usuario:
+            if campo in fila:
+                datos[campo] = _texto(fila, campo, modelo=User) or ''
+        return datos
+
+    def guardar_lote(self, datos):
+        # 1. Usuarios, identificados por username
+        usuarios = {u.username: u for u in User.objects.filter(username__in=[d['username'] for d in datos])}
+        usuarios_nuevos, usuarios_existentes = [], {}
+        for d in datos:
+            usuario = usuarios.get(d['username'])
+            if usuario is None:
+                usuario = User(username=d['username'])
+                usuario.set_unusable_password() # Los profesores definen su contraseña después
+                usuarios[d['username']] = usuario
+                usuarios_nuevos.append(usuario)
+            elif usuario.pk:
+                usuarios_existentes[usuario.pk] = usuario
+            for campo in self.campos_usuario:
+                if campo in d:
+                    setattr(usuario, campo, d[campo])
+        self._upsert(User, list(usuarios_existentes.values()), usuarios_nuevos, list(self.campos_usuario))
+
+        # 2. Profesores, identificados por id_empleado
+        profesores = {p.id_empleado: p for p in Profesor.objects.filter(id_empleado__in=[d['id_empleado'] for d in datos])}
+        nuevos, existentes = [], []
+        for d in datos:
+            profesor = profesores.get(d['id_empleado'])
+            if profesor is None:
+                nuevos.append(Profesor(id_empleado=d['id_empleado'], usuario=usuarios[d['username']], departamento=d['departamento']))
+            else:
+                profesor.usuario = usuarios[d['username']]
+                profesor.departamento = d['departamento']
+                existentes.append(profesor)
+        return self._upsert(Profesor, existentes, nuevos, ['usuario', 'departamento'])
+
+
+class CursoImportador(Importador):
+    clave = 'codigo'
+
+    def normalizar(self, fila):
+        datos = {
+            'codigo': _texto(fila, 'codigo', requerido=True, modelo=Curso),
+            'nombre': _texto(fila, 'nombre', requerido=True, modelo=Curso),
+        }
+        # `profesor` es el id_empleado del profesor asignado; vacío lo desasigna
+        if 'profesor' in fila:
+            datos['profesor'] = _texto(fila, 'profesor', modelo=Profesor, campo_modelo='id_empleado') or None
+        return datos
+
+    def guardar_lote(self, datos):
+        ids_empleado = {d['profesor'] for d in datos if d.get('profesor')}
+        profesores = dict(Profesor.objects.filter(id_empleado__in=ids_empleado).values_list('id_empleado', 'id'))
+        faltantes = ids_empleado - profesores.keys()
+        if faltantes:
+            raise ErrorFila(f"No existe profesor con id_empleado: {', '.join(sorted(faltantes))}")
+
+        cursos = {c.codigo: c for c in Curso.objects.filter(codigo__in=[d['codigo'] for d in datos])}
+        nuevos, existentes = [], []
+        for d in datos:
+            curso = cursos.get(d['codigo'])
+            if curso is None:
+                curso = Curso(codigo=d['codigo'])
+                nuevos.append(curso)
+            else:
+                existentes.append(curso)
+            curso.nombre = d['nombre']
+            if 'profesor' in d:
+                curso.profesor_id = profesores.get(d['profesor'])
+        return self._upsert(Curso, existentes, nuevos, ['nombre', 'profesor'])
+
+
+class PreguntaImportador(Importador):
+    clave = 'texto'
+    tipos_validos = {tipo for tipo, _ in Pregunta.TIPOS_PREGUNTA}
+
+    def normalizar(self, fila):
+        datos = {
+            'texto': _texto(fila, 'texto', requerido=True),
+            'tipo_pregunta': _texto(fila, 'tipo_pregunta', requerido=True),
+        }
+        if datos['tipo_pregunta'] not in self.tipos_validos:
+            raise ErrorFila(f"Tipo de pregunta inválido: {datos['tipo_pregunta']!r}")
+        if fila.get('es_obligatoria') not in (None, ''):
+            datos['es_obligatoria'] = _booleano(fila['es_obligatoria'])
+        return datos
+
+    def guardar_lote(self, datos):
+        # El texto no es único en la base de datos: si hay duplicados se actualiza el más antiguo
+        preguntas = {}
+        for pregunta in Pregunta.objects.filter(texto__in=[d['texto'] for d in datos]).order_by('-id'):
+            preguntas[pregunta.texto] = pregunta
+        nuevos, existentes = [], []
+        for d in datos:
+            pregunta = preguntas.get(d['texto'])
+            if pregunta is None:
+                nuevos.append(Pregunta(**d))
+            else:
+                pregunta.tipo_pregunta = d['tipo_pregunta']
+                pregunta.es_obligatoria = d.get('es_obligatoria', pregunta.es_obligatoria)
+                existentes.append(pregunta)
+        conteo = self._upsert(Pregunta, existentes, nuevos, ['tipo_pregunta', 'es_obligatoria'])
+
+        # bulk_update no emite señales: se invalidan aquí los esquemas de los formularios afectados
+        invalidar_esquemas(FormularioEvaluacion.preguntas.through.objects.filter(
+            pregunta_id__in=[p.id for p in existentes]
+        ).values_list('formularioevaluacion_id', flat=True))
+        return conteo
+
+
+class FormularioImportador(Importador):
+    clave = 'titulo'
+
+    def normalizar(self, fila):
+        datos = {'titulo': _texto(fila, 'titulo', requerido=True, modelo=FormularioEvaluacion)}
+        if 'descripcion' in fila:
+            datos['descripcion'] = _texto(fila, 'descripcion') or None
+        if fila.get('esta_activo') not in (None, ''):
+            datos['esta_activo'] = _booleano(fila['esta_activo'])
+        # `preguntas`: lista de IDs (JSON) o IDs separados por '|' (CSV)
+        if 'preguntas' in fila:
+            preguntas = fila['preguntas']
+            if isinstance(preguntas, str):
+                preguntas = [p for p in preguntas.split('|') if p.strip()]
+            try:
+                datos['preguntas'] = [int(p) for p in (preguntas or [])]
+            except (TypeError, ValueError):
+                raise ErrorFila(f"IDs de preguntas inválidos: {fila['preguntas']!r}")
+            if not all(0 < p <= MAX_ID for p in datos['preguntas']):
+                raise ErrorFila(f"IDs de preguntas fuera de rango: {fila['preguntas']!r}")
+        return datos
+
+    def guardar_lote(self, datos):
+        ids_preguntas = {p for d in datos for p in d.get('preguntas', [])}
+        faltantes = ids_preguntas - set(Pregunta.objects.filter(id__in=ids_preguntas).values_list('id', flat=True))
+        if faltantes:
+            raise ErrorFila(f"No existen las preguntas con ID: {', '.join(map(str, sorted(faltantes)))}")
+
+        formularios = {}
+        for formulario in FormularioEvaluacion.objects.filter(titulo__in=[d['titulo'] for d in datos]).order_by('-id'):
+            formularios[formulario.titulo] = formulario
+        nuevos, existentes = [], []
+        for d in datos:
+            formulario = formularios.get(d['titulo'])
+            if formulario is None:
+                formulario = FormularioEvaluacion(titulo=d['titulo'])
+                formularios[d['titulo']] = formulario
+                nuevos.append(formulario)
+            else:
+                existentes.append(formulario)
+            for campo in ('descripcion', 'esta_activo'):
+                if campo in d:
+                    setattr(formulario, campo, d[campo])
+        conteo = self._upsert(FormularioEvaluacion, existentes, nuevos, ['descripcion', 'esta_activo'])
+
+        # Relación formulario-pregunta: se reemplaza el conjunto con inserciones masivas
+        Relacion = FormularioEvaluacion.preguntas.through
+        con_preguntas = [(formularios[d['titulo']].id, d['preguntas']) for d in datos if 'preguntas' in d]
+        if con_preguntas:
+            Relacion.objects.filter(formularioevaluacion_id__in=[f for f, _ in con_preguntas]).delete()
+            Relacion.objects.bulk_create(
+                [Relacion(formularioevaluacion_id=f, pregunta_id=p) for f, preguntas in con_preguntas for p in set(preguntas)],
+                batch_size=self.tamano_lote,
+            )
+        invalidar_esquemas([f.id for f in existentes] + [f for f, _ in con_preguntas])
+        return conteo
+
+
+IMPORTADORES = {
+    'profesores': ProfesorImportador,
+    'cursos': CursoImportador,
+    'preguntas': PreguntaImportador,
+    'formularios': FormularioImportador,
+}
+
+
+def importar_archivo(archivo, tipo, formato, tamano_lote=TAMANO_LOTE, progreso=None):
+    """
+    Importa un archivo de texto ya abierto. `tipo` es una clave de IMPORTADORES
+    y `formato` uno de FORMATOS.
+    """
+    if tipo not in IMPORTADORES:
+        raise ValueError(f"Tipo no soportado: {tipo}. Usa uno de {', '.join(IMPORTADORES)}.")
+    if formato not in FORMATOS:
+        raise ValueError(f"Formato no soportado: {formato}. Usa uno de {', '.join(FORMATOS)}.")
+    importador = IMPORTADORES[tipo](tamano_lote=tamano_lote, progreso=progreso)
+    return importador.importar(leer_filas(archivo, formato))
@@ -0,0 +1,182 @@
+import os
+import random
+import sqlite3
+import statistics
+import tempfile
+import time
+
+from django.core.management.base import BaseCommand
+
+# Esquemas equivalentes a los que genera Django en SQLite, antes y después del formato compacto
+ESQUEMA_COMUN = """
+CREATE TABLE pregunta (id integer NOT NULL PRIMARY KEY AUTOINCREMENT, texto text NOT NULL, tipo_pregunta varchar(20) NOT NULL);
+CREATE TABLE evaluacion (id integer NOT NULL PRIMARY KEY AUTOINCREMENT, profesor_id bigint NOT NULL, curso_id bigint NOT NULL);
+"""
+ESQUEMA_ANTERIOR = ESQUEMA_COMUN + """
+CREATE TABLE respuesta (
+    id integer NOT NULL PRIMARY KEY AUTOINCREMENT,
+    respuesta_texto text NULL,
+    respuesta_calificacion integer NULL,
+    respuesta_booleana bool NULL,
+    respuesta_seleccion varchar(255) NULL,
+    respuesta_multiples_selecciones text NULL,
+    evaluacion_id bigint NOT NULL,
+    pregunta_id bigint NOT NULL
+);
+CREATE UNIQUE INDEX respuesta_unica ON respuesta (evaluacion_id, pregunta_id);
+CREATE INDEX respuesta_evaluacion ON respuesta (evaluacion_id);
+CREATE INDEX respuesta_pregunta ON respuesta (pregunta_id);
+"""
+ESQUEMA_COMPACTO = ESQUEMA_COMUN + """
+CREATE TABLE respuesta (
+    id integer NOT NULL PRIMARY KEY AUTOINCREMENT,
+    evaluacion_id bigint NOT NULL,
+    pregunta_id bigint NOT NULL,
+    valor smallint NULL
+);
+CREATE TABLE respuestacontenido (respuesta_id bigint NOT NULL PRIMARY KEY, texto text NULL, selecciones text NULL);
+CREATE UNIQUE INDEX respuesta_unica ON respuesta (evaluacion_id, pregunta_id);
+CREATE INDEX respuesta_pregunta ON respuesta (pregunta_id);
+"""
+# Agregaciones de reportes: (formato anterior, formato compacto)
+CONSULTAS = {
+    'promedio por profesor': (
+        """SELECT e.profesor_id, AVG(r.respuesta_calificacion) FROM respuesta r
+        JOIN evaluacion e ON e.id = r.evaluacion_id GROUP BY e.profesor_id""",
+        """SELECT e.profesor_id, AVG(r.valor) FROM respuesta r
+        JOIN evaluacion e ON e.id = r.evaluacion_id
+        JOIN pregunta p ON p.id = r.pregunta_id AND p.tipo_pregunta = 'calificacion'
+        GROUP BY e.profesor_id""",
+    ),
+    'promedio por pregunta': (
+        """SELECT r.pregunta_id, AVG(r.respuesta_calificacion) FROM respuesta r
+        WHERE r.respuesta_calificacion IS NOT NULL GROUP BY r.pregunta_id""",
+        """SELECT r.pregunta_id, AVG(r.valor) FROM respuesta r
+        JOIN pregunta p ON p.id = r.pregunta_id AND p.tipo_pregunta = 'calificacion'
+        GROUP BY r.pregunta_id""",
+    ),
+}
+PALABRAS = "el profesor explica con claridad y responde las dudas de la clase aunque a veces avanza rapido".split()
+
+
+class Command(BaseCommand):
+    help = (
+        "Compara en SQLite el formato anterior de Respuesta (cinco columnas anulables) con el formato "
+        "compacto (valor numérico + RespuestaContenido): tamaño en disco y tiempo de agregaciones de reportes."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--evaluaciones', type=int, default=100000)
+        parser.add_argument('--calificaciones', type=int, default=15, help='Preguntas de calificación por formulario.')
+        parser.add_argument('--booleanas', type=int, default=2, help='Preguntas Sí/No por formulario.')
+        parser.add_argument('--textos', type=int, default=2, help='Preguntas de texto libre por formulario.')
+        parser.add_argument('--selecciones', type=int, default=1, help='Preguntas de selección múltiple por formulario.')
+        parser.add_argument('--repeticiones', type=int, default=5)
+        parser.add_argument('--semilla', type=int, default=1)
+
+    def handle(self, *args, **options):
+        tipos = (
+            ['calificacion'] * options['calificaciones'] + ['booleano'] * options['booleanas']
+            + ['texto'] * options['textos'] + ['seleccion_multiple'] * options['selecciones']
+        )
+        with tempfile.TemporaryDirectory() as directorio:
+            resultados = {}
+            for indice, (nombre, esquema) in enumerate((('anterior', ESQUEMA_ANTERIOR), ('compacto', ESQUEMA_COMPACTO))):
+                ruta = os.path.join(directorio, f'{nombre}.sqlite3')
+                random.seed(options['semilla']) # Mismos datos en ambos formatos
+                self._poblar(ruta, esquema, nombre == 'compacto', tipos, options['evaluaciones'])
+                resultados[nombre] = {
+                    'archivo': os.path.getsize(ruta),
+                    'tabla': self._tamano_tabla(ruta, 'respuesta'),
+                    'tiempos': {
+                        consulta: self._medir(ruta, sentencias[indice], options['repeticiones'])
+                        for consulta, sentencias in CONSULTAS.items()
+                    },
+                }
+
+        anterior, compacto = resultados['anterior'], resultados['compacto']
+        self.stdout.write(
+            f"{options['evaluaciones']} evaluaciones, {options['evaluaciones'] * len(tipos)} respuestas "
+            f"({len(tipos)} por evaluación)"
+        )
+        self.stdout.write(f"{'':<28}{'anterior':>12}{'compacto':>12}{'cambio':>10}")
+        self._fila('archivo (MB)', anterior['archivo'] / 1e6, compacto['archivo'] / 1e6)
+        if anterior['tabla'] is not None:
+            self._fila('tabla respuesta (MB)', anterior['tabla'] / 1e6, compacto['tabla'] / 1e6)
+        for consulta in CONSULTAS:
+            self._fila(f'{consulta} (ms)', anterior['tiempos'][consulta] * 1000, compacto['tiempos'][consulta] * 1000)
+
+    def _fila(self, nombre, anterior, compacto):
+        self.stdout.write(f"{nombre:<28}{anterior:>12.1f}{compacto:>12.1f}{100 * (compacto / anterior - 1):>+9.1f}%")
+
+    def _poblar(self, ruta, esquema, compacto, tipos, evaluaciones):
+        conexion = sqlite3.connect(ruta)
+        conexion.executescript(esquema)
+        conexion.executemany(
+            "INSERT INTO pregunta (id, texto, tipo_pregunta) VALUES (?, ?, ?)",
+            [(i, f'Pregunta {i}', tipo) for i, tipo in enumerate(tipos, start=1)],
+        )
+        conexion.executemany(
+            "INSERT INTO evaluacion (id, profesor_id, curso_id) VALUES (?, ?, ?)",
+            [(i, random.randint(1, 500), random.randint(1, 2000)) for i in range(1, evaluaciones + 1)],
+        )
+        respuestas, contenidos = [], []
+        id_respuesta = 0
+        for evaluacion in range(1, evaluaciones + 1):
+            for pregunta, tipo in enumerate(tipos, start=1):
+                id_respuesta += 1
+                valor = texto = selecciones = None
+                if tipo == 'calificacion':
+                    valor = random.randint(1, 5)
+                elif tipo == 'booleano':
+                    valor = random.randint(0, 1)
+                elif tipo == 'texto':
+                    texto = ' '.join(random.choices(PALABRAS, k=random.randint(0, 40))) or None
+                else:
+                    selecciones = '["' + '", "'.join(random.sample(PALABRAS, random.randint(1, 3))) + '"]'
+                if compacto:
+                    respuestas.append((id_respuesta, evaluacion, pregunta, valor))
+                    if texto is not None or selecciones is not None:
+                        contenidos.append((id_respuesta, texto, selecciones))
+                else:
+                    calificacion = valor if tipo == 'calificacion' else None
+                    booleana = valor if tipo == 'booleano' else None
+                    respuestas.append((id_respuesta, texto, calificacion, booleana, None, selecciones, evaluacion, pregunta))
+            if len(respuestas) >= 100000:
+                self._insertar(conexion, respuestas, contenidos)
+                respuestas, contenidos = [], []
+        self._insertar(conexion, respuestas, contenidos)
+        conexion.commit()
+        conexion.execute("VACUUM")
+        conexion.close()
+
+    @staticmethod
+    def _insertar(conexion, respuestas, contenidos):
+        if respuestas:
+            marcadores = ', '.join('?' * len(respuestas[0]))
+            conexion.executemany(f"INSERT INTO respuesta VALUES ({marcadores})", respuestas)
+        if contenidos:
+            conexion.executemany("INSERT INTO respuestacontenido VALUES (?, ?, ?)", contenidos)
+
+    @staticmethod
+    def _tamano_tabla(ruta, tabla):
+        # dbstat solo existe si SQLite se compiló con SQLITE_ENABLE_DBSTAT_VTAB
+        conexion = sqlite3.connect(ruta)
+        try:
+            return conexion.execute("SELECT SUM(pgsize) FROM dbstat WHERE name = ?", [tabla]).fetchone()[0]
+        except sqlite3.OperationalError:
+            return None
+        finally:
+            conexion.close()
+
+    @staticmethod
+    def _medir(ruta, consulta, repeticiones):
+        conexion = sqlite3.connect(ruta)
+        conexion.execute(consulta).fetchall() # Calienta la caché de páginas
+        tiempos = []
+        for _ in range(repeticiones):
+            inicio = time.perf_counter()
+            conexion.execute(consulta).fetchall()
+            tiempos.append(time.perf_counter() - inicio)
+        conexion.close()
+        return statistics.median(tiempos)
@@ -0,0 +1,36 @@
+import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core_evaluacion.snapshot import TAMANO_LOTE, construir_snapshot, directorio_snapshot
+
+
+class Command(BaseCommand):
+    help = (
+        "Construye o actualiza incrementalmente el snapshot columnar de calificaciones "
+        "con las evaluaciones enviadas antes de la fecha de corte."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--hasta', help='Fecha de corte AAAA-MM-DD (exclusiva). Por defecto, hoy.')
+        parser.add_argument('--completo', action='store_true', help='Reconstruye el snapshot desde cero.')
+        parser.add_argument('--lote', type=int, default=TAMANO_LOTE, help=f'Filas por lote (por defecto {TAMANO_LOTE}).')
+
+    def handle(self, *args, **options):
+        hasta = None
+        if options['hasta']:
+            try:
+                hasta = datetime.date.fromisoformat(options['hasta'])
+            except ValueError:
+                raise CommandError("--hasta debe tener el formato AAAA-MM-DD.")
+
+        def progreso(meta):
+            self.stdout.write(f"{meta['filas']} filas en el snapshot...")
+
+        try:
+            meta = construir_snapshot(hasta=hasta, completo=options['completo'], tamano_lote=options['lote'], progreso=progreso)
+        except ValueError as e:
+            raise CommandError(str(e))
+        self.stdout.write(self.style.SUCCESS(
+            f"Snapshot en {directorio_snapshot()}: {meta['filas']} filas hasta {meta['hasta']}."
+        ))
@@ -0,0 +1,44 @@
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core_evaluacion.importacion import FORMATOS, IMPORTADORES, TAMANO_LOTE, importar_archivo
+
+
+class Command(BaseCommand):
+    help = (
+        "Importa (crea o actualiza) profesores, cursos, preguntas o formularios desde un archivo "
+        "CSV o JSON Lines, procesándolo en lotes."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('tipo', choices=list(IMPORTADORES), help='Tipo de datos a importar.')
+        parser.add_argument('archivo', help='Ruta del archivo CSV (con encabezado) o JSON Lines.')
+        parser.add_argument('--formato', choices=FORMATOS, help='Formato del archivo. Por defecto se deduce de la extensión.')
+        parser.add_argument('--lote', type=int, default=TAMANO_LOTE, help=f'Filas por lote (por defecto {TAMANO_LOTE}).')
+
+    def handle(self, *args, **options):
+        ruta = Path(options['archivo'])
+        if not ruta.is_file():
+            raise CommandError(f"No existe el archivo: {ruta}")
+        formato = options['formato'] or ('csv' if ruta.suffix.lower() == '.csv' else 'json')
+
+        def progreso(resultado):
+            self.stdout.write(
+                f"{resultado.procesadas} filas procesadas "
+                f"({resultado.creadas} creadas, {resultado.actualizadas} actualizadas, {resultado.total_errores} errores)"
+            )
+
+        # newline='' es necesario para que el módulo csv maneje saltos de línea dentro de campos
+        with ruta.open(encoding='utf-8-sig', newline='') as archivo:
+            resultado = importar_archivo(archivo, options['tipo'], formato, options['lote'], progreso)
+
+        for error in resultado.errores:
+            self.stderr.write(f"Línea {error['linea']}: {error['error']}")
+        if resultado.total_errores > len(resultado.errores):
+            self.stderr.write(f"... y {resultado.total_errores - len(resultado.errores)} errores más.")
+        estilo = self.style.WARNING if resultado.total_errores else self.style.SUCCESS
+        self.stdout.write(estilo(
+            f"Importación terminada: {resultado.creadas} creadas, {resultado.actualizadas} actualizadas, "
+            f"{resultado.total_errores} errores."
+        ))
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-19 03:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core_evaluacion', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='pregunta',
+            name='es_obligatoria',
+            field=models.BooleanField(default=True, verbose_name='¿Es Obligatoria?'),
+        ),
+    ]
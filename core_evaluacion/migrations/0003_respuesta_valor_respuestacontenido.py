@@ -0,0 +1,31 @@
+# Generated by Django 5.2.18 on 2026-10-19 03:10
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core_evaluacion', '0002_pregunta_es_obligatoria'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='respuesta',
+            name='valor',
+            field=models.SmallIntegerField(blank=True, null=True, verbose_name='Valor Numérico'),
+        ),
+        migrations.CreateModel(
+            name='RespuestaContenido',
+            fields=[
+                ('respuesta', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='contenido', serialize=False, to='core_evaluacion.respuesta', verbose_name='Respuesta')),
+                ('texto', models.TextField(blank=True, null=True, verbose_name='Texto')),
+                ('selecciones', models.JSONField(blank=True, null=True, verbose_name='Selecciones')),
+            ],
+            options={
+                'verbose_name': 'Contenido de Respuesta',
+                'verbose_name_plural': 'Contenidos de Respuestas',
+            },
+        ),
+    ]
@@ -0,0 +1,110 @@
+# Copia las respuestas de las cinco columnas respuesta_* al formato compacto
+# (Respuesta.valor + RespuestaContenido), en lotes para no cargar la tabla completa en memoria.
+# Cada columna se toma según el tipo de la pregunta; si una fila tiene datos en columnas que no
+# corresponden a su tipo, la migración se detiene en lugar de descartarlos.
+
+from django.db import migrations
+
+TAMANO_LOTE = 2000
+MAX_CONFLICTOS_REPORTADOS = 20
+# Columna del formato anterior que corresponde a cada tipo de pregunta
+COLUMNAS = {
+    'texto': 'respuesta_texto',
+    'calificacion': 'respuesta_calificacion',
+    'booleano': 'respuesta_booleana',
+    'seleccion_unica': 'respuesta_seleccion',
+    'seleccion_multiple': 'respuesta_multiples_selecciones',
+}
+
+
+def _vacio(valor):
+    return valor is None or valor == '' or valor == []
+
+
+def _lotes(queryset):
+    ultimo_id = 0
+    while True:
+        lote = list(queryset.filter(id__gt=ultimo_id).order_by('id')[:TAMANO_LOTE])
+        if not lote:
+            return
+        yield lote
+        ultimo_id = lote[-1].id
+
+
+def a_formato_compacto(apps, schema_editor):
+    Respuesta = apps.get_model('core_evaluacion', 'Respuesta')
+    RespuestaContenido = apps.get_model('core_evaluacion', 'RespuestaContenido')
+
+    # Idempotente: descarta lo que haya dejado una ejecución anterior
+    RespuestaContenido.objects.all().delete()
+    conflictos = []
+    for lote in _lotes(Respuesta.objects.select_related('pregunta')):
+        contenidos = []
+        for r in lote:
+            tipo = r.pregunta.tipo_pregunta
+            sobrantes = [c for t, c in COLUMNAS.items() if t != tipo and not _vacio(getattr(r, c))]
+            if sobrantes:
+                conflictos.append(f"{r.id} (tipo '{tipo}': {', '.join(sobrantes)})")
+                continue
+            valor = getattr(r, COLUMNAS[tipo])
+            r.valor = None
+            if _vacio(valor):
+                continue
+            if tipo == 'calificacion':
+                r.valor = valor
+            elif tipo == 'booleano':
+                r.valor = int(valor)
+            elif tipo == 'seleccion_multiple':
+                contenidos.append(RespuestaContenido(respuesta_id=r.id, selecciones=valor))
+            else:
+                contenidos.append(RespuestaContenido(respuesta_id=r.id, texto=valor))
+        if not conflictos:
+            Respuesta.objects.bulk_update(lote, ['valor'])
+            RespuestaContenido.objects.bulk_create(contenidos)
+
+    if conflictos:
+        # La migración corre en una transacción: se revierte todo y no se pierde ningún dato
+        raise RuntimeError(
+            f"{len(conflictos)} respuestas tienen datos en columnas que no corresponden al tipo de su pregunta; "
+            f"corrígelas y vuelve a ejecutar la migración. IDs: {'; '.join(conflictos[:MAX_CONFLICTOS_REPORTADOS])}"
+            + (' ...' if len(conflictos) > MAX_CONFLICTOS_REPORTADOS else '')
+        )
+
+
+def a_formato_anterior(apps, schema_editor):
+    Respuesta = apps.get_model('core_evaluacion', 'Respuesta')
+    RespuestaContenido = apps.get_model('core_evaluacion', 'RespuestaContenido')
+
+    for lote in _lotes(Respuesta.objects.select_related('pregunta')):
+        contenidos = {c.respuesta_id: c for c in RespuestaContenido.objects.filter(respuesta_id__in=[r.id for r in lote])}
+        for r in lote:
+            tipo = r.pregunta.tipo_pregunta
+            contenido = contenidos.get(r.id)
+            for columna in COLUMNAS.values():
+                setattr(r, columna, None)
+            if r.valor is not None:
+                if tipo == 'booleano':
+                    r.respuesta_booleana = bool(r.valor)
+                else:
+                    r.respuesta_calificacion = r.valor
+            if contenido is not None:
+                if tipo == 'seleccion_unica':
+                    r.respuesta_seleccion = contenido.texto
+                else:
+                    r.respuesta_texto = contenido.texto
+                r.respuesta_multiples_selecciones = contenido.selecciones
+            r.valor = None
+        Respuesta.objects.bulk_update(lote, list(COLUMNAS.values()) + ['valor'])
+    # El formato compacto queda vacío, así la migración se puede volver a aplicar
+    RespuestaContenido.objects.all().delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core_evaluacion', '0003_respuesta_valor_respuestacontenido'),
+    ]
+
+    operations = [
+        migrations.RunPython(a_formato_compacto, a_formato_anterior),
+    ]
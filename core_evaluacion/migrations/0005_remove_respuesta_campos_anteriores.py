@@ -0,0 +1,39 @@
+# Generated by Django 5.2.18 on 2026-10-19 03:10
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core_evaluacion', '0004_migrar_respuestas_compactas'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='respuesta',
+            name='respuesta_booleana',
+        ),
+        migrations.RemoveField(
+            model_name='respuesta',
+            name='respuesta_calificacion',
+        ),
+        migrations.RemoveField(
+            model_name='respuesta',
+            name='respuesta_multiples_selecciones',
+        ),
+        migrations.RemoveField(
+            model_name='respuesta',
+            name='respuesta_seleccion',
+        ),
+        migrations.RemoveField(
+            model_name='respuesta',
+            name='respuesta_texto',
+        ),
+        migrations.AlterField(
+            model_name='respuesta',
+            name='evaluacion',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='respuestas', to='core_evaluacion.evaluacion', verbose_name='Evaluación'),
+        ),
+    ]
@@ -1,6 +1,17 @@
+from django.core.exceptions import ObjectDoesNotExist
 from django.db import models
+from django.db.models import Avg, Q
 from django.contrib.auth.models import User # Django's built-in User model
 
+# Campo de Respuesta que corresponde a cada tipo de pregunta
+CAMPOS_RESPUESTA = {
+    'texto': 'respuesta_texto',
+    'calificacion': 'respuesta_calificacion',
+    'booleano': 'respuesta_booleana',
+    'seleccion_unica': 'respuesta_seleccion',
+    'seleccion_multiple': 'respuesta_multiples_selecciones',
+}
+
 class Profesor(models.Model):
     usuario = models.OneToOneField(User, on_delete=models.CASCADE, related_name='perfil_profesor', verbose_name='Usuario Asociado')
     id_empleado = models.CharField(max_length=20, unique=True, verbose_name='ID Empleado')
@@ -38,6 +49,7 @@ class Pregunta(models.Model):
     ]
     texto = models.TextField(verbose_name='Texto de la Pregunta')
     tipo_pregunta = models.CharField(max_length=20, choices=TIPOS_PREGUNTA, verbose_name='Tipo de Pregunta')
+    es_obligatoria = models.BooleanField(default=True, verbose_name='¿Es Obligatoria?')
 
     class Meta:
         verbose_name = "Pregunta"
@@ -79,17 +91,35 @@ class Evaluacion(models.Model):
     def __str__(self):
         return f"Evaluación de {self.profesor} por {self.estudiante.username} para {self.curso.nombre}"
 
+class RespuestaManager(models.Manager):
+    def bulk_create(self, objs, *args, **kwargs):
+        # Además de las respuestas, inserta en bloque su contenido de texto/selección (ver Respuesta)
+        objs = super().bulk_create(list(objs), *args, **kwargs)
+        contenidos = []
+        for respuesta in objs:
+            pendiente = respuesta.__dict__.pop('_contenido_pendiente', None)
+            if pendiente and any(v is not None for v in pendiente.values()):
+                contenidos.append(RespuestaContenido(respuesta=respuesta, **pendiente))
+        RespuestaContenido.objects.bulk_create(contenidos)
+        return objs
+
 class Respuesta(models.Model):
-    evaluacion = models.ForeignKey(Evaluacion, on_delete=models.CASCADE, related_name='respuestas', verbose_name='Evaluación')
+    """
+    Respuesta a una pregunta, en formato compacto: la fila solo guarda un valor numérico
+    (calificación 1-5, o 0/1 para booleanos). El texto y las selecciones se guardan aparte,
+    en RespuestaContenido, para que las agregaciones recorran filas angostas.
+
+    Los antiguos campos respuesta_* siguen disponibles como propiedades (también como
+    argumentos del constructor), así serializadores y admin no dependen del formato interno.
+    Solo el campo que corresponde al tipo de la pregunta tiene valor: asignar None lo borra y
+    asignar un valor no vacío a otro campo lanza ValueError.
+    """
+    # Sin índice propio: el índice único (evaluacion, pregunta) ya sirve para buscar por evaluación
+    evaluacion = models.ForeignKey(Evaluacion, on_delete=models.CASCADE, related_name='respuestas', db_index=False, verbose_name='Evaluación')
     pregunta = models.ForeignKey(Pregunta, on_delete=models.CASCADE, verbose_name='Pregunta')
+    valor = models.SmallIntegerField(blank=True, null=True, verbose_name='Valor Numérico') # Calificación o booleano (0/1)
 
-    # Campos para diferentes tipos de respuestas
-    respuesta_texto = models.TextField(blank=True, null=True, verbose_name='Respuesta de Texto')
-    respuesta_calificacion = models.IntegerField(blank=True, null=True, verbose_name='Respuesta de Calificación') # Ej: 1 a 5
-    respuesta_booleana = models.BooleanField(blank=True, null=True, verbose_name='Respuesta Booleana')
-    # Para selección unica/multiple, podrías guardar el valor seleccionado o una lista de valores
-    respuesta_seleccion = models.CharField(max_length=255, blank=True, null=True, verbose_name='Respuesta de Selección') # Si es única
-    respuesta_multiples_selecciones = models.JSONField(blank=True, null=True, verbose_name='Respuestas de Múltiple Selección') # Si es múltiple
+    objects = RespuestaManager()
 
     class Meta:
         verbose_name = "Respuesta"
@@ -98,6 +128,106 @@ class Respuesta(models.Model):
         unique_together = ('evaluacion', 'pregunta')
         ordering = ['pregunta__id']
 
+    def _tipo(self):
+        return self.pregunta.tipo_pregunta if self.pregunta_id else None
+
+    def _contenido(self, campo):
+        pendiente = self.__dict__.get('_contenido_pendiente')
+        if pendiente is not None:
+            return pendiente[campo]
+        if self.pk is None:
+            return None
+        try:
+            return getattr(self.contenido, campo)
+        except ObjectDoesNotExist:
+            return None
+
+    def _corresponde(self, campo, valor):
+        # Indica si `campo` es el del tipo de la pregunta; en los demás solo se aceptan valores vacíos
+        tipo = self._tipo()
+        if CAMPOS_RESPUESTA.get(tipo) == campo:
+            return True
+        if not (valor is None or valor == '' or valor == []):
+            raise ValueError(f"'{campo}' no corresponde a una pregunta de tipo '{tipo}'.")
+        return False
+
+    def _pendiente(self):
+        # Contenido de texto/selección a guardar en RespuestaContenido con el próximo save()
+        if '_contenido_pendiente' not in self.__dict__:
+            self._contenido_pendiente = {'texto': self._contenido('texto'), 'selecciones': self._contenido('selecciones')}
+        return self._contenido_pendiente
+
+    @property
+    def respuesta_calificacion(self):
+        return self.valor if self._tipo() == 'calificacion' else None
+
+    @respuesta_calificacion.setter
+    def respuesta_calificacion(self, valor):
+        if self._corresponde('respuesta_calificacion', valor):
+            self.valor = valor
+
+    @property
+    def respuesta_booleana(self):
+        return bool(self.valor) if self._tipo() == 'booleano' and self.valor is not None else None
+
+    @respuesta_booleana.setter
+    def respuesta_booleana(self, valor):
+        if self._corresponde('respuesta_booleana', valor):
+            self.valor = None if valor is None else int(valor)
+
+    @property
+    def respuesta_texto(self):
+        return self._contenido('texto') if self._tipo() == 'texto' else None
+
+    @respuesta_texto.setter
+    def respuesta_texto(self, valor):
+        if self._corresponde('respuesta_texto', valor):
+            self._pendiente()['texto'] = valor
+
+    @property
+    def respuesta_seleccion(self):
+        return self._contenido('texto') if self._tipo() == 'seleccion_unica' else None
+
+    @respuesta_seleccion.setter
+    def respuesta_seleccion(self, valor):
+        if self._corresponde('respuesta_seleccion', valor):
+            self._pendiente()['texto'] = valor
+
+    @property
+    def respuesta_multiples_selecciones(self):
+        return self._contenido('selecciones') if self._tipo() == 'seleccion_multiple' else None
+
+    @respuesta_multiples_selecciones.setter
+    def respuesta_multiples_selecciones(self, valor):
+        if self._corresponde('respuesta_multiples_selecciones', valor):
+            self._pendiente()['selecciones'] = valor
+
+    def asignar_respuesta(self, respuesta_texto=None, respuesta_calificacion=None, respuesta_booleana=None,
+                          respuesta_seleccion=None, respuesta_multiples_selecciones=None):
+        """
+        Reemplaza por completo el contenido de la respuesta (los valores en None quedan vacíos).
+        Lanza ValueError si se da valor a un campo que no corresponde al tipo de la pregunta.
+        """
+        self.valor = None
+        self._contenido_pendiente = {'texto': None, 'selecciones': None}
+        self.respuesta_texto = respuesta_texto
+        self.respuesta_calificacion = respuesta_calificacion
+        self.respuesta_booleana = respuesta_booleana
+        self.respuesta_seleccion = respuesta_seleccion
+        self.respuesta_multiples_selecciones = respuesta_multiples_selecciones
+
+    def save(self, *args, **kwargs):
+        nueva = self._state.adding
+        super().save(*args, **kwargs)
+        pendiente = self.__dict__.pop('_contenido_pendiente', None)
+        if pendiente is None:
+            return
+        self._state.fields_cache.pop('contenido', None)
+        if any(v is not None for v in pendiente.values()):
+            RespuestaContenido.objects.update_or_create(respuesta=self, defaults=pendiente)
+        elif not nueva:
+            RespuestaContenido.objects.filter(respuesta=self).delete()
+
     def __str__(self):
         content = ""
         if self.respuesta_texto:
@@ -110,4 +240,23 @@ class Respuesta(models.Model):
             content = self.respuesta_seleccion
         elif self.respuesta_multiples_selecciones:
             content = ", ".join(self.respuesta_multiples_selecciones)
-        return f"Respuesta a '{self.pregunta.texto[:50]}...' de {self.evaluacion.estudiante.username}: {content}"
\ No newline at end of file
+        return f"Respuesta a '{self.pregunta.texto[:50]}...' de {self.evaluacion.estudiante.username}: {content}"
+
+class RespuestaContenido(models.Model):
+    respuesta = models.OneToOneField(Respuesta, on_delete=models.CASCADE, primary_key=True, related_name='contenido', verbose_name='Respuesta')
+    texto = models.TextField(blank=True, null=True, verbose_name='Texto') # Texto libre o la opción de selección única
+    selecciones = models.JSONField(blank=True, null=True, verbose_name='Selecciones') # Opciones de selección múltiple
+
+    class Meta:
+        verbose_name = "Contenido de Respuesta"
+        verbose_name_plural = "Contenidos de Respuestas"
+
+    def __str__(self):
+        return f"Contenido de la respuesta {self.respuesta_id}"
+
+def promedio_calificaciones(ruta):
+    """
+    Promedio de las respuestas de calificación alcanzadas por `ruta`, p. ej.
+    promedio_calificaciones('evaluaciones_recibidas__respuestas') desde Profesor.
+    """
+    return Avg(f'{ruta}__valor', filter=Q(**{f'{ruta}__pregunta__tipo_pregunta': 'calificacion'}))
\ No newline at end of file
@@ -1,6 +1,8 @@
 from rest_framework import serializers
 from .models import Profesor, Curso, Pregunta, FormularioEvaluacion, Evaluacion, Respuesta
+from .validacion import obtener_esquema
 from django.contrib.auth.models import User
+from django.db import transaction
 
 # Serializador para el modelo User de Django (para mostrar información del usuario)
 class UserSerializer(serializers.ModelSerializer):
@@ -47,12 +49,23 @@ class FormularioEvaluacionSerializer(serializers.ModelSerializer):
 class RespuestaSerializer(serializers.ModelSerializer):
     # Muestra los detalles de la pregunta asociada
     pregunta = PreguntaSerializer(read_only=True)
-    # Permite al frontend enviar el ID de la pregunta al crear una respuesta
-    pregunta_id = serializers.PrimaryKeyRelatedField(queryset=Pregunta.objects.all(), source='pregunta', write_only=True)
+    # Permite al frontend enviar el ID de la pregunta al crear una respuesta.
+    # No se consulta aquí: EvaluacionSerializer.validate lo comprueba contra el esquema del formulario.
+    pregunta_id = serializers.IntegerField(write_only=True)
+
+    # Campos de respuesta: el modelo los expone como propiedades sobre su formato compacto (ver Respuesta)
+    respuesta_texto = serializers.CharField(required=False, allow_null=True, allow_blank=True)
+    respuesta_calificacion = serializers.IntegerField(required=False, allow_null=True)
+    respuesta_booleana = serializers.BooleanField(required=False, allow_null=True)
+    respuesta_seleccion = serializers.CharField(max_length=255, required=False, allow_null=True, allow_blank=True)
+    respuesta_multiples_selecciones = serializers.JSONField(required=False, allow_null=True)
 
     class Meta:
         model = Respuesta
-        fields = '__all__'
+        fields = [
+            'id', 'pregunta', 'pregunta_id', 'respuesta_texto', 'respuesta_calificacion', 'respuesta_booleana',
+            'respuesta_seleccion', 'respuesta_multiples_selecciones', 'evaluacion',
+        ]
         # Excluye 'evaluacion' ya que se manejara en el serializador padre (EvaluacionSerializer)
         extra_kwargs = {'evaluacion': {'read_only': True}}
 
@@ -77,7 +90,17 @@ class EvaluacionSerializer(serializers.ModelSerializer):
         fields = '__all__'
         read_only_fields = ['estudiante', 'fecha_envio'] # El estudiante se asigna automaticamente en la vista
 
+    def validate(self, attrs):
+        # Valida todas las respuestas de una vez con el esquema compilado del formulario (sin consultas)
+        formulario = attrs.get('formulario_evaluacion')
+        if formulario is not None and 'respuestas' in attrs:
+            errores = obtener_esquema(formulario.id).validar(attrs['respuestas'])
+            if errores:
+                raise serializers.ValidationError(errores)
+        return attrs
+
     # Este metodo es crucial para manejar la creación anidada de Evaluacion y sus Respuestas
+    @transaction.atomic
     def create(self, validated_data):
         # Extrae las respuestas de los datos validados antes de crear la evaluación
         respuestas_data = validated_data.pop('respuestas')
@@ -85,10 +108,12 @@ class EvaluacionSerializer(serializers.ModelSerializer):
         # Crea la instancia de la evaluacion
         evaluacion = Evaluacion.objects.create(**validated_data)
 
-        # Crea las respuestas y las asocia a la evaluación recién creada
-        for respuesta_data in respuestas_data:
-            # Asegúrate de pasar la instancia de la pregunta, no solo el ID
-            pregunta = respuesta_data.pop('pregunta')
-            Respuesta.objects.create(evaluacion=evaluacion, pregunta=pregunta, **respuesta_data)
+        # Crea todas las respuestas en una sola inserción; `validate` ya comprobó cada pregunta_id.
+        # Las preguntas se cargan juntas: Respuesta ubica cada valor según el tipo de su pregunta
+        preguntas = Pregunta.objects.in_bulk([r['pregunta_id'] for r in respuestas_data])
+        Respuesta.objects.bulk_create([
+            Respuesta(evaluacion=evaluacion, pregunta=preguntas[respuesta_data.pop('pregunta_id')], **respuesta_data)
+            for respuesta_data in respuestas_data
+        ])
 
         return evaluacion
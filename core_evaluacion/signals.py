@@ -0,0 +1,34 @@
+"""
+Invalidación de los esquemas de validación compilados (ver validacion.py).
+Las operaciones masivas (bulk_create/bulk_update) no emiten señales: quien las use
+debe llamar a invalidar_esquemas directamente, como hace importacion.py.
+"""
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from .models import FormularioEvaluacion, Pregunta
+from .validacion import invalidar_esquemas
+
+
+@receiver([post_save, post_delete], sender=FormularioEvaluacion)
+def formulario_modificado(sender, instance, **kwargs):
+    invalidar_esquemas([instance.pk])
+
+
+@receiver(post_save, sender=Pregunta)
+@receiver(pre_delete, sender=Pregunta) # Antes de borrar, mientras la relación con los formularios aún existe
+def pregunta_modificada(sender, instance, **kwargs):
+    invalidar_esquemas(instance.formularios_asociados.values_list('id', flat=True))
+
+
+@receiver(m2m_changed, sender=FormularioEvaluacion.preguntas.through)
+def preguntas_de_formulario_modificadas(sender, instance, action, reverse, pk_set, **kwargs):
+    if not reverse:
+        # `instance` es el formulario
+        if action in ('post_add', 'post_remove', 'post_clear'):
+            invalidar_esquemas([instance.pk])
+    elif action in ('post_add', 'post_remove'):
+        # `instance` es la pregunta y `pk_set` contiene los formularios afectados
+        invalidar_esquemas(pk_set)
+    elif action == 'pre_clear':
+        invalidar_esquemas(instance.formularios_asociados.values_list('id', flat=True))
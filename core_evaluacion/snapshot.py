@@ -0,0 +1,310 @@
+"""
+Snapshot columnar de calificaciones para análisis ad-hoc sin consultar la base de datos.
+
+`construir_snapshot` exporta las respuestas de calificación de periodos cerrados (evaluaciones
+enviadas antes de una fecha de corte) como arreglos tipados en disco, un archivo por columna.
+Las ejecuciones siguientes agregan al final de cada archivo las evaluaciones enviadas entre
+el corte anterior y el nuevo; lo que cambie después en un periodo ya exportado (p. ej. una
+respuesta agregada desde el admin) solo se refleja con una reconstrucción completa. Una
+reconstrucción completa escribe una generación nueva de archivos y la publica al reemplazar
+meta.json, así los lectores nunca ven archivos truncados.
+
+`MotorSnapshot` abre esos archivos con memory-map y resuelve agrupaciones y filtros con
+operaciones vectorizadas de numpy. Requiere numpy instalado.
+"""
+import datetime
+import json
+import os
+from pathlib import Path
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import Respuesta
+from .validacion import CALIFICACION_MAX, CALIFICACION_MIN
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Columnas del snapshot y su tipo en disco
+COLUMNAS = {
+    'evaluacion_id': 'int32',
+    'profesor_id': 'int32',
+    'curso_id': 'int32',
+    'pregunta_id': 'int32',
+    'formulario_id': 'int32', # -1 si la evaluación no tiene formulario
+    'dia': 'int32',           # Días desde 1970-01-01 (fecha local de envío)
+    'calificacion': 'int8',   # Solo se exportan calificaciones válidas (CALIFICACION_MIN a CALIFICACION_MAX)
+}
+OPERADORES = ('exact', 'in', 'gte', 'gt', 'lte', 'lt')
+VERSION = 3
+TAMANO_LOTE = 50000
+EPOCA = datetime.date(1970, 1, 1)
+
+
+def _requiere_numpy():
+    if np is None:
+        raise ImproperlyConfigured("El snapshot de calificaciones requiere numpy (pip install numpy).")
+
+
+def directorio_snapshot():
+    return Path(getattr(settings, 'SNAPSHOT_CALIFICACIONES_DIR', settings.BASE_DIR / 'snapshot_calificaciones'))
+
+
+def a_dia(fecha):
+    """Convierte una fecha al número de día usado en la columna `dia`."""
+    return (fecha - EPOCA).days
+
+
+def desde_dia(dia):
+    return EPOCA + datetime.timedelta(days=int(dia))
+
+
+def _archivo(directorio, columna, generacion):
+    return directorio / f'{columna}.{generacion}.bin'
+
+
+def _leer_meta(directorio):
+    try:
+        with open(directorio / 'meta.json', encoding='utf-8') as f:
+            meta = json.load(f)
+    except FileNotFoundError:
+        return None
+    return meta if meta.get('version') == VERSION else None
+
+
+def _escribir_meta(directorio, meta):
+    # Se escribe en un archivo temporal y se reemplaza, para que los lectores nunca vean un meta a medias
+    temporal = directorio / 'meta.json.tmp'
+    with open(temporal, 'w', encoding='utf-8') as f:
+        json.dump(meta, f)
+    os.replace(temporal, directorio / 'meta.json')
+
+
+def construir_snapshot(hasta=None, completo=False, directorio=None, tamano_lote=TAMANO_LOTE, progreso=None):
+    """
+    Exporta (o actualiza) el snapshot con las calificaciones enviadas antes de `hasta`
+    (por defecto, hoy). Con `completo=True` se reconstruye desde cero.
+    Devuelve el contenido de meta.json resultante. Lanza ValueError si `hasta` es anterior
+    al corte del snapshot existente (salvo en una reconstrucción completa).
+    """
+    _requiere_numpy()
+    directorio = Path(directorio or directorio_snapshot())
+    directorio.mkdir(parents=True, exist_ok=True)
+    hasta = hasta or timezone.localdate()
+    meta = _leer_meta(directorio)
+    if not completo and meta is not None and hasta < datetime.date.fromisoformat(meta['hasta']):
+        raise ValueError(
+            f"La fecha de corte {hasta} es anterior a la del snapshot ({meta['hasta']}); usa una reconstrucción completa."
+        )
+    if completo or meta is None:
+        # Generación nueva: los archivos publicados no se tocan hasta reemplazar meta.json
+        generacion = meta['generacion'] + 1 if meta else 1
+        meta = {'version': VERSION, 'generacion': generacion, 'filas': 0, 'hasta': None}
+        for columna in COLUMNAS:
+            open(_archivo(directorio, columna, generacion), 'wb').close()
+    else:
+        # Descarta lo que una ejecución interrumpida haya alcanzado a escribir después de la
+        # última fila confirmada; los lectores nunca mapean más allá de meta['filas']
+        for columna, tipo in COLUMNAS.items():
+            with open(_archivo(directorio, columna, meta['generacion']), 'ab') as f:
+                f.truncate(meta['filas'] * np.dtype(tipo).itemsize)
+
+    # Se exporta por periodo (no por ID): una evaluación posterior al corte anterior nunca se salta,
+    # aunque en la base de datos haya respuestas con IDs mayores de periodos ya exportados
+    filas = Respuesta.objects.filter(
+        evaluacion__fecha_envio__lt=_inicio_del_dia(hasta),
+        pregunta__tipo_pregunta='calificacion',
+        valor__range=(CALIFICACION_MIN, CALIFICACION_MAX),
+    )
+    if meta['hasta']:
+        filas = filas.filter(evaluacion__fecha_envio__gte=_inicio_del_dia(datetime.date.fromisoformat(meta['hasta'])))
+    filas = (
+        filas
+        .annotate(dia=TruncDate('evaluacion__fecha_envio'))
+        .order_by('id')
+        .values_list(
+            'evaluacion_id', 'evaluacion__profesor_id', 'evaluacion__curso_id', 'pregunta_id',
+            'evaluacion__formulario_evaluacion_id', 'dia', 'valor',
+        )
+    )
+
+    archivos = {columna: open(_archivo(directorio, columna, meta['generacion']), 'ab') for columna in COLUMNAS}
+    try:
+        lote = []
+        for fila in filas.iterator(chunk_size=tamano_lote):
+            lote.append(fila)
+            if len(lote) >= tamano_lote:
+                _escribir_lote(archivos, lote, meta)
+                lote = []
+                if progreso:
+                    progreso(meta)
+        if lote:
+            _escribir_lote(archivos, lote, meta)
+    finally:
+        for f in archivos.values():
+            f.close()
+
+    meta['hasta'] = hasta.isoformat()
+    _escribir_meta(directorio, meta)
+    _eliminar_generaciones_anteriores(directorio, meta['generacion'])
+    return meta
+
+
+def _eliminar_generaciones_anteriores(directorio, generacion):
+    vigentes = {_archivo(directorio, columna, generacion).name for columna in COLUMNAS}
+    for ruta in directorio.glob('*.bin'):
+        if ruta.name not in vigentes:
+            try:
+                ruta.unlink()
+            except OSError:
+                # En Windows no se puede borrar un archivo mapeado; se reintenta en la próxima reconstrucción
+                pass
+
+
+def _inicio_del_dia(fecha):
+    return timezone.make_aware(datetime.datetime.combine(fecha, datetime.time.min))
+
+
+def _escribir_lote(archivos, lote, meta):
+    evaluaciones, profesores, cursos, preguntas, formularios, dias, calificaciones = zip(*lote)
+    valores = {
+        'evaluacion_id': evaluaciones,
+        'profesor_id': profesores,
+        'curso_id': cursos,
+        'pregunta_id': preguntas,
+        'formulario_id': [-1 if f is None else f for f in formularios],
+        'dia': [a_dia(d) for d in dias],
+        'calificacion': calificaciones,
+    }
+    for columna, tipo in COLUMNAS.items():
+        np.asarray(valores[columna], dtype=tipo).tofile(archivos[columna])
+        archivos[columna].flush()
+    meta['filas'] += len(lote)
+
+
+class MotorSnapshot:
+    """
+    Resuelve agregaciones sobre el snapshot en memoria mapeada.
+
+        motor.agregar(agrupar_por=['profesor_id'], filtros={'curso_id__in': [1, 2], 'dia__gte': datetime.date(2025, 3, 1)})
+
+    devuelve una lista de diccionarios con las columnas agrupadas más
+    `total_respuestas`, `total_evaluaciones`, `suma` y `promedio`.
+    """
+
+    def __init__(self, directorio=None):
+        _requiere_numpy()
+        directorio = Path(directorio or directorio_snapshot())
+        meta = _leer_meta(directorio)
+        if meta is None:
+            raise FileNotFoundError(f"No hay un snapshot construido en {directorio}.")
+        self.filas = meta['filas']
+        self.hasta = datetime.date.fromisoformat(meta['hasta'])
+        self.columnas = {}
+        for columna, tipo in COLUMNAS.items():
+            if self.filas:
+                # Solo se mapean las filas confirmadas en meta.json, aunque el archivo tenga más
+                self.columnas[columna] = np.memmap(
+                    _archivo(directorio, columna, meta['generacion']), dtype=tipo, mode='r', shape=(self.filas,)
+                )
+            else:
+                self.columnas[columna] = np.empty(0, dtype=tipo)
+
+    def _mascara(self, filtros):
+        mascara = np.ones(self.filas, dtype=bool)
+        for clave, valor in (filtros or {}).items():
+            columna, _, operador = clave.partition('__')
+            operador = operador or 'exact'
+            if columna not in COLUMNAS or operador not in OPERADORES:
+                raise ValueError(f"Filtro no soportado: {clave}")
+            if columna == 'dia':
+                valor = [a_dia(v) for v in valor] if operador == 'in' else a_dia(valor)
+            datos = self.columnas[columna]
+            if operador == 'exact':
+                mascara &= datos == valor
+            elif operador == 'in':
+                # Los valores fuera del rango del tipo de la columna no pueden coincidir con ninguna fila
+                limites = np.iinfo(datos.dtype)
+                valores = [v for v in valor if limites.min <= v <= limites.max]
+                mascara &= np.isin(datos, np.asarray(valores, dtype=datos.dtype))
+            elif operador == 'gte':
+                mascara &= datos >= valor
+            elif operador == 'gt':
+                mascara &= datos > valor
+            elif operador == 'lte':
+                mascara &= datos <= valor
+            elif operador == 'lt':
+                mascara &= datos < valor
+        return mascara
+
+    def agregar(self, agrupar_por=(), filtros=None):
+        for columna in agrupar_por:
+            if columna not in COLUMNAS:
+                raise ValueError(f"Columna no soportada: {columna}")
+        mascara = self._mascara(filtros)
+        calificaciones = self.columnas['calificacion'][mascara].astype(np.float64)
+        evaluaciones = self.columnas['evaluacion_id'][mascara]
+
+        if agrupar_por:
+            claves = np.stack([self.columnas[c][mascara].astype(np.int64) for c in agrupar_por], axis=1)
+            grupos, inverso = np.unique(claves, axis=0, return_inverse=True)
+            inverso = inverso.reshape(-1)
+        else:
+            if not len(calificaciones):
+                return []
+            grupos = np.empty((1, 0), dtype=np.int64)
+            inverso = np.zeros(len(calificaciones), dtype=np.int64)
+
+        total = len(grupos)
+        conteos = np.bincount(inverso, minlength=total)
+        sumas = np.bincount(inverso, weights=calificaciones, minlength=total)
+        # Evaluaciones distintas por grupo: pares (grupo, evaluación) únicos
+        pares = np.unique(np.stack([inverso, evaluaciones.astype(np.int64)], axis=1), axis=0)
+        conteo_evaluaciones = np.bincount(pares[:, 0], minlength=total)
+
+        resultado = []
+        for i in range(total):
+            fila = {}
+            for j, columna in enumerate(agrupar_por):
+                valor = int(grupos[i, j])
+                if columna == 'dia':
+                    valor = desde_dia(valor)
+                elif columna == 'formulario_id' and valor == -1:
+                    valor = None
+                fila[columna] = valor
+            fila.update({
+                'total_respuestas': int(conteos[i]),
+                'total_evaluaciones': int(conteo_evaluaciones[i]),
+                'suma': float(sumas[i]),
+                'promedio': float(sumas[i] / conteos[i]),
+            })
+            resultado.append(fila)
+        return resultado
+
+
+_motor_cache = {}
+
+
+def obtener_motor(directorio=None):
+    """
+    Devuelve un MotorSnapshot reutilizable; se vuelve a abrir solo cuando meta.json cambia.
+    Devuelve None si todavía no se ha construido un snapshot.
+    """
+    directorio = Path(directorio or directorio_snapshot())
+    try:
+        version = os.stat(directorio / 'meta.json').st_mtime_ns
+    except FileNotFoundError:
+        return None
+    en_cache = _motor_cache.get(directorio)
+    if en_cache is None or en_cache[0] != version:
+        try:
+            en_cache = (version, MotorSnapshot(directorio))
+        except FileNotFoundError:
+            return None
+        _motor_cache[directorio] = en_cache
+    return en_cache[1]
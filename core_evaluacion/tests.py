@@ -1,3 +1,555 @@
-from django.test import TestCase
+import asyncio
+import datetime
+import io
+import json
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import DataError, connection
+from django.db.migrations.executor import MigrationExecutor
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from . import snapshot, throttling, validacion
+from .admin import RespuestaForm
+from .eventos import CanalDashboard, canal_dashboard
+from .importacion import CursoImportador, importar_archivo
+from .models import Curso, Evaluacion, FormularioEvaluacion, Pregunta, Profesor, Respuesta, RespuestaContenido
+
+
+def _json_lines(*filas):
+    return io.StringIO('\n'.join(json.dumps(f) for f in filas))
+
+
+class ImportacionTests(TestCase):
+    def test_crea_y_actualiza_cursos(self):
+        Curso.objects.create(codigo='MAT1', nombre='Anterior')
+        resultado = importar_archivo(
+            io.StringIO("codigo,nombre\nMAT1,Matemáticas I\nFIS1,Física I\n"), 'cursos', 'csv'
+        )
+        self.assertEqual((resultado.creadas, resultado.actualizadas, resultado.total_errores), (1, 1, 0))
+        self.assertEqual(Curso.objects.get(codigo='MAT1').nombre, 'Matemáticas I')
+
+    def test_valores_no_escalares_son_errores_de_fila(self):
+        resultado = importar_archivo(_json_lines(
+            {'codigo': ['MAT1'], 'nombre': 'Matemáticas'},
+            {'codigo': 'FIS1', 'nombre': {'es': 'Física'}},
+            {'codigo': 'QUI1', 'nombre': 'Química'},
+        ), 'cursos', 'json')
+        self.assertEqual(resultado.creadas, 1)
+        self.assertEqual([e['linea'] for e in resultado.errores], [1, 2])
+        self.assertIn("'codigo' debe ser texto", resultado.errores[0]['error'])
+        self.assertEqual(list(Curso.objects.values_list('codigo', flat=True)), ['QUI1'])
+
+    def test_enteros_se_aceptan_como_texto(self):
+        resultado = importar_archivo(_json_lines({'codigo': 101, 'nombre': 'Álgebra'}), 'cursos', 'json')
+        self.assertEqual(resultado.total_errores, 0)
+        self.assertTrue(Curso.objects.filter(codigo='101').exists())
+
+    def test_valida_longitud_maxima(self):
+        resultado = importar_archivo(_json_lines(
+            {'username': 'ana', 'id_empleado': 'E' * 21, 'departamento': 'Ciencias'},
+        ), 'profesores', 'json')
+        self.assertEqual(resultado.total_errores, 1)
+        self.assertIn('máximo 20 caracteres', resultado.errores[0]['error'])
+        self.assertFalse(Profesor.objects.exists())
+
+    def test_error_de_base_de_datos_se_reintenta_fila_a_fila(self):
+        guardar_lote = CursoImportador.guardar_lote
+
+        def falla_con_largo(importador, datos):
+            # Simula el DataError que otros motores lanzan con valores fuera de rango
+            if any(d['codigo'] == 'MALO' for d in datos):
+                raise DataError('value too long')
+            return guardar_lote(importador, datos)
+
+        with mock.patch.object(CursoImportador, 'guardar_lote', falla_con_largo):
+            resultado = importar_archivo(
+                io.StringIO("codigo,nombre\nMAT1,Matemáticas\nMALO,Inválido\nFIS1,Física\n"), 'cursos', 'csv'
+            )
+        self.assertEqual(resultado.creadas, 2)
+        self.assertEqual(resultado.errores, [{'linea': 3, 'error': 'value too long'}])
+
+    def test_ids_de_preguntas_fuera_de_rango(self):
+        pregunta = Pregunta.objects.create(texto='Claridad', tipo_pregunta='calificacion')
+        resultado = importar_archivo(_json_lines(
+            {'titulo': 'Fuera de rango', 'preguntas': [10 ** 20]},
+            {'titulo': 'Negativo', 'preguntas': [-1]},
+            {'titulo': 'Válido', 'preguntas': [pregunta.id]},
+        ), 'formularios', 'json')
+        self.assertEqual([e['linea'] for e in resultado.errores], [1, 2])
+        self.assertIn('fuera de rango', resultado.errores[0]['error'])
+        self.assertEqual(list(FormularioEvaluacion.objects.values_list('titulo', flat=True)), ['Válido'])
+
+    def test_overflow_de_la_base_de_datos_se_reporta_por_fila(self):
+        guardar_lote = CursoImportador.guardar_lote
+
+        def desborda(importador, datos):
+            if any(d['codigo'] == 'MALO' for d in datos):
+                raise OverflowError('Python int too large to convert to SQLite INTEGER')
+            return guardar_lote(importador, datos)
+
+        with mock.patch.object(CursoImportador, 'guardar_lote', desborda):
+            resultado = importar_archivo(io.StringIO("codigo,nombre\nMALO,Inválido\nFIS1,Física\n"), 'cursos', 'csv')
+        self.assertEqual((resultado.creadas, resultado.total_errores), (1, 1))
+
+    def test_profesor_inexistente_en_curso(self):
+        resultado = importar_archivo(
+            io.StringIO("codigo,nombre,profesor\nMAT1,Matemáticas,E404\n"), 'cursos', 'csv'
+        )
+        self.assertEqual(resultado.total_errores, 1)
+        self.assertFalse(Curso.objects.exists())
+
+
+class EnvioEvaluacionTests(TestCase):
+    def setUp(self):
+        cache.clear() # Los IDs de formularios se reutilizan entre tests
+        self.profesor = Profesor.objects.create(usuario=User.objects.create(username='profe'), id_empleado='E1', departamento='Ciencias')
+        self.curso = Curso.objects.create(codigo='MAT1', nombre='Matemáticas')
+        self.cliente = APIClient()
+
+    def _enviar(self, respuestas):
+        formulario = FormularioEvaluacion.objects.create(titulo=f'Formulario {len(respuestas)}')
+        preguntas = [Pregunta.objects.create(texto=tipo, tipo_pregunta=tipo) for tipo, _, _ in respuestas]
+        formulario.preguntas.set(preguntas)
+        self.cliente.force_authenticate(User.objects.create(username=f'alumno{len(respuestas)}'))
+        datos = {
+            'profesor_id': self.profesor.id, 'curso_id': self.curso.id, 'formulario_evaluacion_id': formulario.id,
+            'respuestas': [{'pregunta_id': p.id, campo: valor} for p, (_, campo, valor) in zip(preguntas, respuestas)],
+        }
+        with CaptureQueriesContext(connection) as consultas:
+            respuesta = self.cliente.post('/api/evaluaciones/', datos, format='json')
+        self.assertEqual(respuesta.status_code, 201, respuesta.content)
+        return respuesta.json(), len(consultas)
+
+    def test_respuesta_de_creacion_sin_consultas_por_respuesta(self):
+        # Ambos envíos incluyen texto, así los dos insertan en RespuestaContenido
+        _, una = self._enviar([('texto', 'respuesta_texto', 'Bien')])
+        datos, cuatro = self._enviar([
+            ('calificacion', 'respuesta_calificacion', 4),
+            ('texto', 'respuesta_texto', 'Muy claro'),
+            ('booleano', 'respuesta_booleana', True),
+            ('seleccion_multiple', 'respuesta_multiples_selecciones', ['a']),
+        ])
+        self.assertEqual(una, cuatro)
+        self.assertEqual(
+            [(r['respuesta_calificacion'], r['respuesta_texto'], r['respuesta_booleana'], r['respuesta_multiples_selecciones'])
+             for r in datos['respuestas']],
+            [(4, None, None, None), (None, 'Muy claro', None, None), (None, None, True, None), (None, None, None, ['a'])],
+        )
+
+    def _formulario_basico(self):
+        formulario = FormularioEvaluacion.objects.create(titulo='Formulario')
+        self.calificacion = Pregunta.objects.create(texto='Claridad', tipo_pregunta='calificacion')
+        self.comentario = Pregunta.objects.create(texto='Comentarios', tipo_pregunta='texto', es_obligatoria=False)
+        formulario.preguntas.set([self.calificacion, self.comentario])
+        return formulario
+
+    def _rechazado(self, formulario, respuestas):
+        self.cliente.force_authenticate(User.objects.create(username=f'alumno{User.objects.count()}'))
+        respuesta = self.cliente.post('/api/evaluaciones/', {
+            'profesor_id': self.profesor.id, 'curso_id': self.curso.id, 'formulario_evaluacion_id': formulario.id,
+            'respuestas': respuestas,
+        }, format='json')
+        self.assertEqual(respuesta.status_code, 400)
+        self.assertFalse(Evaluacion.objects.exists())
+        return respuesta.json()
+
+    def test_pregunta_fuera_del_formulario(self):
+        formulario = self._formulario_basico()
+        ajena = Pregunta.objects.create(texto='Ajena', tipo_pregunta='calificacion')
+        errores = self._rechazado(formulario, [
+            {'pregunta_id': self.calificacion.id, 'respuesta_calificacion': 4},
+            {'pregunta_id': ajena.id, 'respuesta_calificacion': 4},
+        ])
+        self.assertEqual(errores['respuestas'][0], {})
+        self.assertIn('no pertenece a este formulario', errores['respuestas'][1]['pregunta_id'][0])
+
+    def test_respuesta_duplicada(self):
+        formulario = self._formulario_basico()
+        errores = self._rechazado(formulario, [
+            {'pregunta_id': self.calificacion.id, 'respuesta_calificacion': 4},
+            {'pregunta_id': self.calificacion.id, 'respuesta_calificacion': 5},
+        ])
+        self.assertIn('más de una vez', errores['respuestas'][1]['pregunta_id'][0])
+
+    def test_columna_que_no_corresponde_al_tipo(self):
+        formulario = self._formulario_basico()
+        errores = self._rechazado(formulario, [
+            {'pregunta_id': self.calificacion.id, 'respuesta_calificacion': 4, 'respuesta_texto': 'Excelente'},
+        ])
+        self.assertIn("usa 'respuesta_calificacion'", errores['respuestas'][0]['respuesta_texto'][0])
+
+    def test_calificacion_fuera_de_rango(self):
+        formulario = self._formulario_basico()
+        errores = self._rechazado(formulario, [{'pregunta_id': self.calificacion.id, 'respuesta_calificacion': 7}])
+        self.assertIn('entre 1 y 5', errores['respuestas'][0]['respuesta_calificacion'][0])
+
+    def test_pregunta_obligatoria_sin_responder(self):
+        formulario = self._formulario_basico()
+        errores = self._rechazado(formulario, [{'pregunta_id': self.comentario.id, 'respuesta_texto': 'Bien'}])
+        self.assertEqual(errores['preguntas_sin_responder'], [str(self.calificacion.id)])
+
+    def test_esquema_en_cache_valida_sin_consultas(self):
+        formulario = self._formulario_basico()
+        validacion.obtener_esquema(formulario.id)
+        with self.assertNumQueries(0):
+            errores = validacion.obtener_esquema(formulario.id).validar([
+                {'pregunta_id': self.calificacion.id, 'respuesta_calificacion': 4},
+            ])
+        self.assertEqual(errores, {})
+
+    def test_invalida_al_agregar_preguntas_al_formulario(self):
+        formulario = self._formulario_basico()
+        validacion.obtener_esquema(formulario.id)
+        nueva = Pregunta.objects.create(texto='Puntualidad', tipo_pregunta='calificacion')
+        with self.captureOnCommitCallbacks(execute=True):
+            formulario.preguntas.add(nueva)
+        esquema = validacion.obtener_esquema(formulario.id)
+        self.assertEqual(esquema.validar([{'pregunta_id': self.calificacion.id, 'respuesta_calificacion': 4}]),
+                         {'preguntas_sin_responder': [nueva.id]})
+
+    def test_invalida_al_modificar_una_pregunta(self):
+        formulario = self._formulario_basico()
+        validacion.obtener_esquema(formulario.id)
+        self.calificacion.es_obligatoria = False
+        with self.captureOnCommitCallbacks(execute=True):
+            self.calificacion.save()
+        self.assertEqual(validacion.obtener_esquema(formulario.id).validar([]), {})
+
+    def test_esquema_compilado_durante_un_cambio_no_queda_vigente(self):
+        formulario = FormularioEvaluacion.objects.create(titulo='Formulario')
+        formulario.preguntas.add(Pregunta.objects.create(texto='Claridad', tipo_pregunta='calificacion'))
+        nueva = Pregunta.objects.create(texto='Puntualidad', tipo_pregunta='calificacion')
+        compilar_esquema = validacion.compilar_esquema
+
+        def compila_y_cambia(formulario_id):
+            # El formulario cambia después de leer su estado y antes de guardar el esquema en la caché
+            esquema = compilar_esquema(formulario_id)
+            with self.captureOnCommitCallbacks(execute=True):
+                formulario.preguntas.add(nueva)
+            return esquema
+
+        with mock.patch.object(validacion, 'compilar_esquema', compila_y_cambia):
+            self.assertEqual(len(validacion.obtener_esquema(formulario.id).preguntas), 1)
+        self.assertEqual(len(validacion.obtener_esquema(formulario.id).preguntas), 2)
+
+
+@unittest.skipIf(snapshot.np is None, "Requiere numpy")
+class SnapshotTests(TestCase):
+    def setUp(self):
+        temporal = tempfile.TemporaryDirectory()
+        self.addCleanup(temporal.cleanup)
+        self.directorio = Path(temporal.name)
+        self.hasta = timezone.localdate() + datetime.timedelta(days=1)
+        profesor = Profesor.objects.create(usuario=User.objects.create(username='profe'), id_empleado='E1', departamento='Ciencias')
+        curso = Curso.objects.create(codigo='MAT1', nombre='Matemáticas', profesor=profesor)
+        pregunta = Pregunta.objects.create(texto='Claridad', tipo_pregunta='calificacion')
+        for i, valor in enumerate((4, 2)):
+            evaluacion = Evaluacion.objects.create(
+                estudiante=User.objects.create(username=f'alumno{i}'), profesor=profesor, curso=curso
+            )
+            Respuesta.objects.create(evaluacion=evaluacion, pregunta=pregunta, respuesta_calificacion=valor)
+        self.profesor = profesor
+
+    def test_reconstruccion_completa_no_trunca_el_snapshot_publicado(self):
+        snapshot.construir_snapshot(hasta=self.hasta, directorio=self.directorio)
+        anterior = snapshot.MotorSnapshot(self.directorio)
+        meta = snapshot.construir_snapshot(hasta=self.hasta, completo=True, directorio=self.directorio)
+
+        self.assertEqual((meta['generacion'], meta['filas']), (2, 2))
+        # Un motor abierto antes de la reconstrucción sigue leyendo sus datos, y uno nuevo lee la generación publicada
+        for motor in (anterior, snapshot.MotorSnapshot(self.directorio)):
+            self.assertEqual(motor.agregar()[0]['promedio'], 3.0)
+
+    def test_incremental_exporta_por_periodo_sin_saltar_evaluaciones(self):
+        hoy = timezone.localdate()
+        anterior, de_hoy = Evaluacion.objects.order_by('id')
+        Evaluacion.objects.filter(id=anterior.id).update(fecha_envio=timezone.now() - datetime.timedelta(days=1))
+        # Respuesta agregada después (ID mayor) a la evaluación del periodo ya cerrado
+        Respuesta.objects.create(
+            evaluacion=anterior, respuesta_calificacion=5,
+            pregunta=Pregunta.objects.create(texto='Puntualidad', tipo_pregunta='calificacion'),
+        )
+
+        meta = snapshot.construir_snapshot(hasta=hoy, directorio=self.directorio)
+        self.assertEqual(meta['filas'], 2)
+        meta = snapshot.construir_snapshot(hasta=self.hasta, directorio=self.directorio)
+        self.assertEqual(meta['filas'], 3)
+        resultado = snapshot.MotorSnapshot(self.directorio).agregar(filtros={'evaluacion_id': de_hoy.id})
+        self.assertEqual(resultado[0]['total_respuestas'], 1)
+
+        with self.assertRaises(ValueError):
+            snapshot.construir_snapshot(hasta=hoy, directorio=self.directorio)
+
+    def test_omite_calificaciones_fuera_de_rango(self):
+        Respuesta.objects.create(
+            evaluacion=Evaluacion.objects.first(), respuesta_calificacion=300,
+            pregunta=Pregunta.objects.create(texto='Puntualidad', tipo_pregunta='calificacion'),
+        )
+        meta = snapshot.construir_snapshot(hasta=self.hasta, directorio=self.directorio)
+        self.assertEqual(meta['filas'], 2)
+
+    def test_filtro_in_con_ids_fuera_de_rango(self):
+        snapshot.construir_snapshot(hasta=self.hasta, directorio=self.directorio)
+        motor = snapshot.MotorSnapshot(self.directorio)
+        self.assertEqual(motor.agregar(filtros={'profesor_id__in': [99999999999]}), [])
+        resultado = motor.agregar(filtros={'profesor_id__in': [99999999999, self.profesor.id]})
+        self.assertEqual(resultado[0]['total_respuestas'], 2)
+
+
+@override_settings(REST_FRAMEWORK={
+    **settings.REST_FRAMEWORK,
+    'DEFAULT_THROTTLE_RATES': {'envios': '20/min', 'reportes': '6/min', 'lectura': '2/min'},
+})
+class ThrottlingTests(TestCase):
+    def setUp(self):
+        throttling.TokenBucketThrottle._buckets.clear()
+        throttling.TokenBucketThrottle._buckets_anonimos.clear()
+        self.addCleanup(throttling.TokenBucketThrottle._buckets.clear)
+        self.addCleanup(throttling.TokenBucketThrottle._buckets_anonimos.clear)
+        self.cliente = APIClient()
+
+    def test_excede_el_limite_con_retry_after(self):
+        self.cliente.force_authenticate(User.objects.create(username='alumno'))
+        for _ in range(2):
+            self.assertEqual(self.cliente.get('/api/profesores/').status_code, 200)
+        respuesta = self.cliente.get('/api/profesores/')
+        self.assertEqual(respuesta.status_code, 429)
+        self.assertGreaterEqual(int(respuesta['Retry-After']), 1)
+
+    def test_anonimos_no_desalojan_buckets_de_usuarios(self):
+        usuario = User.objects.create(username='alumno')
+        self.cliente.force_authenticate(usuario)
+        for _ in range(3):
+            self.cliente.get('/api/profesores/')
+        self.cliente.force_authenticate(None)
+        with mock.patch.object(throttling.TokenBucketThrottle, 'max_buckets_anonimos', 2):
+            for i in range(5):
+                # X-Forwarded-For se ignora: todas cuentan para la misma IP
+                self.cliente.get('/api/profesores/', HTTP_X_FORWARDED_FOR=f'10.0.0.{i}')
+        self.assertEqual(len(throttling.TokenBucketThrottle._buckets_anonimos), 1)
+        self.cliente.force_authenticate(usuario)
+        self.assertEqual(self.cliente.get('/api/profesores/').status_code, 429)
+
+    def test_reportes_se_rechazan_durante_un_pico_de_envios(self):
+        self.cliente.force_authenticate(User.objects.create(username='admin', is_staff=True))
+        umbral = settings.CONTROL_ADMISION['UMBRAL_ENVIOS_PRIORIDAD']
+        with mock.patch.object(throttling.control_admision, 'envios_en_curso', umbral):
+            respuesta = self.cliente.get('/api/profesores/estadisticas_generales/')
+        self.assertEqual(respuesta.status_code, 503)
+        self.assertEqual(respuesta['Retry-After'], str(settings.CONTROL_ADMISION['RETRY_AFTER']))
+        self.assertEqual(self.cliente.get('/api/profesores/estadisticas_generales/').status_code, 200)
+
+    def test_reporte_libera_su_lugar_si_falla(self):
+        @throttling.reporte_pesado
+        def reporte():
+            raise RuntimeError('falla')
+
+        for _ in range(settings.CONTROL_ADMISION['REPORTES_MAX_CONCURRENTES'] + 1):
+            with self.assertRaises(RuntimeError):
+                reporte()
+        self.assertEqual(throttling.control_admision.reportes_en_curso, 0)
+
+
+class RespuestaCompactaTests(TestCase):
+    def setUp(self):
+        profesor = Profesor.objects.create(usuario=User.objects.create(username='profe'), id_empleado='E1', departamento='Ciencias')
+        self.evaluacion = Evaluacion.objects.create(
+            estudiante=User.objects.create(username='alumno'), profesor=profesor,
+            curso=Curso.objects.create(codigo='MAT1', nombre='Matemáticas'),
+        )
+        self.calificacion = Pregunta.objects.create(texto='Claridad', tipo_pregunta='calificacion')
+        self.texto = Pregunta.objects.create(texto='Comentarios', tipo_pregunta='texto', es_obligatoria=False)
+
+    def test_campo_que_no_corresponde_al_tipo(self):
+        respuesta = Respuesta(evaluacion=self.evaluacion, pregunta=self.calificacion)
+        with self.assertRaises(ValueError):
+            respuesta.asignar_respuesta(respuesta_calificacion=4, respuesta_booleana=False)
+        with self.assertRaises(ValueError):
+            Respuesta(evaluacion=self.evaluacion, pregunta=self.texto, respuesta_seleccion='sel')
+        # Los valores vacíos en otros campos se ignoran
+        respuesta = Respuesta(evaluacion=self.evaluacion, pregunta=self.texto, respuesta_texto='Bien', respuesta_seleccion='')
+        respuesta.save()
+        self.assertEqual(Respuesta.objects.get(id=respuesta.id).respuesta_texto, 'Bien')
+
+    def test_none_borra_el_valor(self):
+        calificacion = Respuesta.objects.create(evaluacion=self.evaluacion, pregunta=self.calificacion, respuesta_calificacion=4)
+        texto = Respuesta.objects.create(evaluacion=self.evaluacion, pregunta=self.texto, respuesta_texto='Bien')
+        calificacion.respuesta_calificacion = None
+        calificacion.save()
+        texto.respuesta_texto = None
+        texto.save()
+        self.assertIsNone(Respuesta.objects.get(id=calificacion.id).valor)
+        self.assertFalse(RespuestaContenido.objects.exists())
+
+    def _formulario_admin(self, **datos):
+        return RespuestaForm(data={'pregunta': self.calificacion.id, **datos}, instance=Respuesta(evaluacion=self.evaluacion))
+
+    def test_admin_valida_segun_el_tipo_de_pregunta(self):
+        formulario = self._formulario_admin(respuesta_calificacion='4', respuesta_booleana='false')
+        self.assertFalse(formulario.is_valid())
+        self.assertIn('respuesta_booleana', formulario.errors)
+
+        formulario = self._formulario_admin(respuesta_calificacion='300')
+        self.assertFalse(formulario.is_valid())
+        self.assertIn('entre 1 y 5', formulario.errors['respuesta_calificacion'][0])
+
+        formulario = self._formulario_admin(respuesta_calificacion='4', respuesta_texto='')
+        self.assertTrue(formulario.is_valid(), formulario.errors)
+        self.assertEqual(formulario.save().valor, 4)
+
+
+class DashboardEventosTests(TestCase):
+    def setUp(self):
+        self.profesor = Profesor.objects.create(usuario=User.objects.create(username='profe'), id_empleado='E1', departamento='Ciencias')
+        self.curso = Curso.objects.create(codigo='MAT1', nombre='Matemáticas')
+        self.pregunta = Pregunta.objects.create(texto='Claridad', tipo_pregunta='calificacion')
+
+    def _evaluacion(self, calificacion):
+        evaluacion = Evaluacion.objects.create(
+            estudiante=User.objects.create(username=f'alumno{calificacion}'), profesor=self.profesor, curso=self.curso
+        )
+        Respuesta.objects.create(evaluacion=evaluacion, pregunta=self.pregunta, respuesta_calificacion=calificacion)
+        return evaluacion
+
+    async def test_flujo_envia_estado_y_evaluaciones(self):
+        await sync_to_async(self._evaluacion)(4)
+        await self.async_client.aforce_login(await User.objects.acreate(username='coordinador', is_staff=True))
+        respuesta = await self.async_client.get('/api/dashboard/eventos/')
+        self.assertEqual(respuesta.status_code, 200)
+        flujo = aiter(respuesta.streaming_content)
+        try:
+            estado = (await anext(flujo)).decode()
+            self.assertTrue(estado.startswith('event: estado\n'))
+            self.assertIn('"total_evaluaciones": 1, "promedio_calificacion": 4.0', estado)
+
+            canal_dashboard.publicar_evaluacion(99, self.profesor.id, self.curso.id, [2])
+            evento = (await asyncio.wait_for(anext(flujo), timeout=5)).decode()
+            self.assertTrue(evento.startswith('event: evaluacion\n'))
+            datos = json.loads(evento.split('data: ', 1)[1])
+            self.assertEqual(datos['profesor'], {'id': self.profesor.id, 'total_evaluaciones': 2, 'promedio_calificacion': 3.0})
+        finally:
+            await flujo.aclose()
+
+    async def test_solo_para_staff(self):
+        await self.async_client.aforce_login(await User.objects.acreate(username='alumno'))
+        respuesta = await self.async_client.get('/api/dashboard/eventos/')
+        self.assertEqual(respuesta.status_code, 403)
+
+    def test_evaluaciones_publicadas_durante_la_carga_no_se_cuentan_dos_veces(self):
+        ya_guardada = self._evaluacion(4)
+        canal = CanalDashboard()
+        cargar = CanalDashboard._cargar
+
+        def carga_con_envios_concurrentes():
+            resultado = cargar()
+            # Llegan mientras se carga: una que la consulta ya contó y otra confirmada después
+            canal.publicar_evaluacion(ya_guardada.id, self.profesor.id, self.curso.id, [4])
+            canal.publicar_evaluacion(ya_guardada.id + 1000, self.profesor.id, self.curso.id, [2])
+            return resultado
+
+        with mock.patch.object(canal, '_cargar', carga_con_envios_concurrentes):
+            suscripcion, estado = canal.suscribir(loop=None)
+        datos = json.loads(estado.split('data: ', 1)[1])
+        self.assertEqual(datos['profesores'], [{'id': self.profesor.id, 'total_evaluaciones': 2, 'promedio_calificacion': 3.0}])
+        canal.desuscribir(suscripcion)
+
+
+class MigracionRespuestasCompactasTests(TransactionTestCase):
+    anterior = [('core_evaluacion', '0002_pregunta_es_obligatoria')]
+    esquema_compacto = [('core_evaluacion', '0003_respuesta_valor_respuestacontenido')]
+    datos_compactos = [('core_evaluacion', '0004_migrar_respuestas_compactas')]
+    final = [('core_evaluacion', '0005_remove_respuesta_campos_anteriores')]
+
+    def _migrar(self, destino):
+        executor = MigrationExecutor(connection)
+        executor.migrate(destino)
+        return executor.loader.project_state(destino).apps
+
+    def setUp(self):
+        apps = self._migrar(self.anterior)
+        self.Respuesta = apps.get_model('core_evaluacion', 'Respuesta')
+        Pregunta = apps.get_model('core_evaluacion', 'Pregunta')
+        profesor = apps.get_model('core_evaluacion', 'Profesor').objects.create(
+            usuario_id=User.objects.create(username='profe').id, id_empleado='E1', departamento='Ciencias'
+        )
+        curso = apps.get_model('core_evaluacion', 'Curso').objects.create(codigo='MAT1', nombre='Matemáticas')
+        self.evaluacion = apps.get_model('core_evaluacion', 'Evaluacion').objects.create(
+            estudiante_id=User.objects.create(username='alumno').id, profesor=profesor, curso=curso
+        )
+        self.preguntas = {
+            tipo: Pregunta.objects.create(texto=tipo, tipo_pregunta=tipo)
+            for tipo in ('texto', 'calificacion', 'booleano', 'seleccion_unica', 'seleccion_multiple')
+        }
+
+    def tearDown(self):
+        self._migrar(self.final)
+
+    def _respuesta(self, tipo, **columnas):
+        return self.Respuesta.objects.create(evaluacion=self.evaluacion, pregunta=self.preguntas[tipo], **columnas).id
+
+    def _crear_respuestas_validas(self):
+        return {
+            'texto': self._respuesta('texto', respuesta_texto='Muy claro', respuesta_seleccion=''),
+            'calificacion': self._respuesta('calificacion', respuesta_calificacion=5),
+            'booleano': self._respuesta('booleano', respuesta_booleana=False),
+            'seleccion_unica': self._respuesta('seleccion_unica', respuesta_seleccion='Mañana'),
+            'seleccion_multiple': self._respuesta('seleccion_multiple', respuesta_multiples_selecciones=['a', 'b']),
+        }
+
+    def _verificar_formato_compacto(self, ids):
+        respuestas = {r.pregunta.tipo_pregunta: r for r in Respuesta.objects.select_related('pregunta', 'contenido')}
+        self.assertEqual(respuestas['calificacion'].valor, 5)
+        self.assertIs(respuestas['booleano'].respuesta_booleana, False)
+        self.assertEqual(respuestas['texto'].respuesta_texto, 'Muy claro')
+        self.assertEqual(respuestas['seleccion_unica'].respuesta_seleccion, 'Mañana')
+        self.assertEqual(respuestas['seleccion_multiple'].respuesta_multiples_selecciones, ['a', 'b'])
+        self.assertEqual(
+            set(RespuestaContenido.objects.values_list('respuesta_id', flat=True)),
+            {ids['texto'], ids['seleccion_unica'], ids['seleccion_multiple']},
+        )
+
+    def test_migra_cada_columna_segun_el_tipo_de_pregunta(self):
+        ids = self._crear_respuestas_validas()
+        self._migrar(self.final)
+        self._verificar_formato_compacto(ids)
+
+    def test_columnas_que_no_corresponden_al_tipo_detienen_la_migracion(self):
+        conflicto = self._respuesta('calificacion', respuesta_calificacion=5, respuesta_booleana=True)
+        otro = self._respuesta('texto', respuesta_texto='txt', respuesta_seleccion='sel', respuesta_calificacion=3)
+        with self.assertRaisesMessage(RuntimeError, '2 respuestas') as contexto:
+            self._migrar(self.datos_compactos)
+        self.assertIn(f"{conflicto} (tipo 'calificacion': respuesta_booleana)", str(contexto.exception))
+        self.assertIn(f"{otro} (tipo 'texto': respuesta_calificacion, respuesta_seleccion)", str(contexto.exception))
+
+        # Nada se descartó: los datos anteriores siguen intactos y se puede reintentar tras corregirlos
+        apps = self._migrar(self.esquema_compacto)
+        RespuestaAnterior = apps.get_model('core_evaluacion', 'Respuesta')
+        self.assertFalse(RespuestaAnterior.objects.filter(valor__isnull=False).exists())
+        self.assertEqual(RespuestaAnterior.objects.get(id=otro).respuesta_seleccion, 'sel')
+        RespuestaAnterior.objects.filter(id=conflicto).update(respuesta_booleana=None)
+        RespuestaAnterior.objects.filter(id=otro).update(respuesta_seleccion=None, respuesta_calificacion=None)
+        self._migrar(self.final)
+        self.assertEqual(Respuesta.objects.get(id=conflicto).valor, 5)
+
+    def test_ida_y_vuelta(self):
+        ids = self._crear_respuestas_validas()
+        self._migrar(self.final)
+        apps = self._migrar(self.esquema_compacto)
+        RespuestaAnterior = apps.get_model('core_evaluacion', 'Respuesta')
+        self.assertFalse(apps.get_model('core_evaluacion', 'RespuestaContenido').objects.exists())
+        self.assertFalse(RespuestaAnterior.objects.filter(valor__isnull=False).exists())
+        self.assertIs(RespuestaAnterior.objects.get(id=ids['booleano']).respuesta_booleana, False)
+        self.assertEqual(RespuestaAnterior.objects.get(id=ids['seleccion_unica']).respuesta_seleccion, 'Mañana')
+
+        self._migrar(self.final)
+        self._verificar_formato_compacto(ids)
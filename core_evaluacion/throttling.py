@@ -0,0 +1,175 @@
+"""
+Control de carga para los picos de envío de evaluaciones.
+
+- TokenBucketThrottle: limita peticiones por usuario y por ámbito (`envios`, `reportes`, `lectura`)
+  con un token bucket en memoria del proceso. Las tasas salen de REST_FRAMEWORK['DEFAULT_THROTTLE_RATES'].
+- ControlAdmision: limita cuántos reportes pesados se ejecutan a la vez y los rechaza mientras
+  haya muchos envíos en curso, para que los envíos de evaluaciones tengan prioridad.
+
+Ambos mantienen su estado por proceso: con varios workers, cada uno aplica sus propios límites.
+"""
+import functools
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+from django.conf import settings
+from rest_framework import exceptions, permissions, status
+from rest_framework.settings import api_settings
+from rest_framework.throttling import BaseThrottle
+
+DURACIONES = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+
+class TokenBucket:
+    __slots__ = ('capacidad', 'tasa', 'tokens', 'actualizado')
+
+    def __init__(self, capacidad, tasa, ahora):
+        self.capacidad = capacidad
+        self.tasa = tasa # Tokens por segundo
+        self.tokens = capacidad
+        self.actualizado = ahora
+
+    def consumir(self, ahora):
+        """Consume un token si hay. Devuelve 0 o los segundos hasta que haya uno disponible."""
+        self.tokens = min(self.capacidad, self.tokens + (ahora - self.actualizado) * self.tasa)
+        self.actualizado = ahora
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0
+        return (1 - self.tokens) / self.tasa
+
+
+class TokenBucketThrottle(BaseThrottle):
+    """
+    Throttle por ámbito. El ámbito es `throttle_scope` de la vista (o de la acción);
+    si no está definido, las peticiones de lectura usan `lectura` y el resto no se limita.
+
+    Los anónimos se identifican por IP (ver NUM_PROXIES en settings) y tienen su propio conjunto
+    de buckets, así rotar IPs no puede desalojar los buckets de los usuarios autenticados.
+    """
+    max_buckets = 10000 # Se descartan los buckets menos usados para acotar la memoria
+    max_buckets_anonimos = 10000
+    _buckets = OrderedDict()
+    _buckets_anonimos = OrderedDict()
+    _lock = threading.Lock()
+
+    def __init__(self):
+        self.espera = None
+
+    @staticmethod
+    def parse_rate(rate):
+        """'30/min' -> (30, 0.5): capacidad del bucket y tokens por segundo."""
+        cantidad, periodo = rate.split('/')
+        cantidad = int(cantidad)
+        return cantidad, cantidad / DURACIONES[periodo[0]]
+
+    def get_scope(self, request, view):
+        scope = getattr(view, 'throttle_scope', None)
+        if scope:
+            return scope
+        if request.method in permissions.SAFE_METHODS:
+            return 'lectura'
+        return None
+
+    def allow_request(self, request, view):
+        scope = self.get_scope(request, view)
+        rate = api_settings.DEFAULT_THROTTLE_RATES.get(scope) if scope else None
+        if not rate:
+            return True
+        capacidad, tasa = self.parse_rate(rate)
+        if request.user and request.user.is_authenticated:
+            buckets, maximo, clave = self._buckets, self.max_buckets, (scope, request.user.pk)
+        else:
+            buckets, maximo, clave = self._buckets_anonimos, self.max_buckets_anonimos, (scope, self.get_ident(request))
+        ahora = time.monotonic()
+
+        with self._lock:
+            bucket = buckets.get(clave)
+            if bucket is None or bucket.capacidad != capacidad or bucket.tasa != tasa:
+                bucket = TokenBucket(capacidad, tasa, ahora)
+                buckets[clave] = bucket
+                if len(buckets) > maximo:
+                    buckets.popitem(last=False)
+            else:
+                buckets.move_to_end(clave)
+            self.espera = bucket.consumir(ahora)
+        return self.espera == 0
+
+    def wait(self):
+        return self.espera
+
+
+class ServicioSaturado(exceptions.APIException):
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = 'El servidor está atendiendo un pico de carga. Intenta nuevamente en unos segundos.'
+    default_code = 'servicio_saturado'
+
+    def __init__(self, wait, detail=None):
+        super().__init__(detail)
+        self.wait = wait # DRF lo devuelve en la cabecera Retry-After
+
+
+class ControlAdmision:
+    """
+    Cuenta los envíos y reportes en curso. Los envíos nunca se rechazan aquí;
+    los reportes se rechazan si se alcanzó su máximo o si hay demasiados envíos en curso.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.envios_en_curso = 0
+        self.reportes_en_curso = 0
+
+    @staticmethod
+    def _config():
+        config = {'REPORTES_MAX_CONCURRENTES': 2, 'UMBRAL_ENVIOS_PRIORIDAD': 20, 'RETRY_AFTER': 5}
+        config.update(getattr(settings, 'CONTROL_ADMISION', {}))
+        return config
+
+    @contextmanager
+    def envio(self):
+        with self._lock:
+            self.envios_en_curso += 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                self.envios_en_curso -= 1
+
+    @contextmanager
+    def reporte(self):
+        config = self._config()
+        with self._lock:
+            if self.envios_en_curso >= config['UMBRAL_ENVIOS_PRIORIDAD']:
+                raise ServicioSaturado(config['RETRY_AFTER'], 'Los reportes están pausados mientras se procesa un pico de envíos.')
+            if self.reportes_en_curso >= config['REPORTES_MAX_CONCURRENTES']:
+                raise ServicioSaturado(config['RETRY_AFTER'], 'Hay demasiados reportes en ejecución.')
+            self.reportes_en_curso += 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                self.reportes_en_curso -= 1
+
+
+control_admision = ControlAdmision()
+
+
+def reporte_pesado(metodo):
+    """Decora una acción de la vista para que pase por el control de admisión de reportes."""
+    @functools.wraps(metodo)
+    def envoltura(*args, **kwargs):
+        with control_admision.reporte():
+            return metodo(*args, **kwargs)
+    return envoltura
+
+
+def prioridad_envio(metodo):
+    """Decora una acción de la vista para que cuente como envío en curso."""
+    @functools.wraps(metodo)
+    def envoltura(*args, **kwargs):
+        with control_admision.envio():
+            return metodo(*args, **kwargs)
+    return envoltura
@@ -2,7 +2,8 @@ from rest_framework.routers import DefaultRouter
 from django.urls import path, include
 from .views import (
     ProfesorViewSet, CursoViewSet, PreguntaViewSet,
-    FormularioEvaluacionViewSet, EvaluacionViewSet
+    FormularioEvaluacionViewSet, EvaluacionViewSet, ImportacionViewSet,
+    dashboard_eventos
 )
 
 # Creamos un router para registrar nuestros ViewSets
@@ -12,8 +13,10 @@ router.register(r'cursos', CursoViewSet)
 router.register(r'preguntas', PreguntaViewSet)
 router.register(r'formularios-evaluacion', FormularioEvaluacionViewSet)
 router.register(r'evaluaciones', EvaluacionViewSet)
+router.register(r'importaciones', ImportacionViewSet, basename='importacion')
 
 urlpatterns = [
     # Incluimos todas las URLs generadas por el router
     path('', include(router.urls)),
+    path('dashboard/eventos/', dashboard_eventos, name='dashboard-eventos'), # Feed SSE (ASGI)
 ]
\ No newline at end of file
@@ -0,0 +1,161 @@
+"""
+Validación compilada de envíos de evaluaciones.
+
+Cada formulario se compila en un EsquemaFormulario inmutable (qué preguntas tiene, su tipo y
+si son obligatorias) que se guarda en la caché de Django. Con el esquema, un envío completo se
+valida en memoria sin consultas. Las señales de `signals.py` invalidan el esquema cuando cambia
+el formulario, sus preguntas o la relación entre ambos.
+
+La invalidación cambia la versión del formulario, que forma parte de la clave del esquema en la
+caché. Con varios workers la caché debe ser compartida (Redis, Memcached): con LocMemCache cada
+proceso tiene su propia copia y solo se entera de los cambios hechos en él.
+"""
+import uuid
+from dataclasses import dataclass
+
+from django.conf import settings
+from django.core import checks
+from django.core.cache import cache
+from django.db import transaction
+
+from .models import CAMPOS_RESPUESTA, FormularioEvaluacion
+CALIFICACION_MIN = 1
+CALIFICACION_MAX = 5
+PREFIJO_CACHE = 'esquema_formulario'
+TIMEOUT_CACHE = 60 * 60 # Acota cuánto podría durar un esquema desactualizado en la caché
+
+
+def _vacio(valor):
+    return valor is None or valor == '' or valor == []
+
+
+@dataclass(frozen=True)
+class PreguntaCompilada:
+    id: int
+    tipo: str
+    obligatoria: bool
+
+
+@dataclass(frozen=True)
+class EsquemaFormulario:
+    formulario_id: int
+    preguntas: tuple # Tupla de PreguntaCompilada
+
+    def __post_init__(self):
+        object.__setattr__(self, '_por_id', {p.id: p for p in self.preguntas})
+
+    def validar(self, respuestas):
+        """
+        Valida la lista de respuestas de un envío (diccionarios con `pregunta_id` y los
+        campos respuesta_*). Devuelve un diccionario de errores, vacío si el envío es válido:
+            'respuestas': lista alineada con la entrada, con los errores de cada respuesta
+            'preguntas_sin_responder': IDs de preguntas obligatorias sin respuesta
+        """
+        errores_respuestas = []
+        respondidas = set()
+        hay_errores = False
+
+        for respuesta in respuestas:
+            errores = self._validar_respuesta(respuesta, respondidas)
+            hay_errores = hay_errores or bool(errores)
+            errores_respuestas.append(errores)
+
+        errores = {}
+        if hay_errores:
+            errores['respuestas'] = errores_respuestas
+        faltantes = [p.id for p in self.preguntas if p.obligatoria and p.id not in respondidas]
+        if faltantes:
+            errores['preguntas_sin_responder'] = faltantes
+        return errores
+
+    def _validar_respuesta(self, respuesta, respondidas):
+        pregunta_id = respuesta.get('pregunta_id')
+        pregunta = self._por_id.get(pregunta_id)
+        if pregunta is None:
+            return {'pregunta_id': [f"La pregunta {pregunta_id} no pertenece a este formulario."]}
+        if pregunta_id in respondidas:
+            return {'pregunta_id': [f"La pregunta {pregunta_id} se respondió más de una vez."]}
+        respondidas.add(pregunta_id)
+
+        errores = {}
+        campo_esperado = CAMPOS_RESPUESTA[pregunta.tipo]
+        for campo in CAMPOS_RESPUESTA.values():
+            if campo != campo_esperado and not _vacio(respuesta.get(campo)):
+                errores[campo] = [f"No corresponde a una pregunta de tipo '{pregunta.tipo}'; usa '{campo_esperado}'."]
+
+        valor = respuesta.get(campo_esperado)
+        if _vacio(valor):
+            if pregunta.obligatoria:
+                errores[campo_esperado] = ["Esta pregunta es obligatoria."]
+        elif pregunta.tipo == 'calificacion' and not CALIFICACION_MIN <= valor <= CALIFICACION_MAX:
+            errores[campo_esperado] = [f"La calificación debe estar entre {CALIFICACION_MIN} y {CALIFICACION_MAX}."]
+        elif pregunta.tipo == 'seleccion_multiple' and not (
+            isinstance(valor, list) and all(isinstance(v, str) for v in valor)
+        ):
+            errores[campo_esperado] = ["Debe ser una lista de opciones (texto)."]
+        return errores
+
+
+def compilar_esquema(formulario_id):
+    preguntas = FormularioEvaluacion.preguntas.through.objects.filter(
+        formularioevaluacion_id=formulario_id
+    ).values_list('pregunta_id', 'pregunta__tipo_pregunta', 'pregunta__es_obligatoria')
+    return EsquemaFormulario(
+        formulario_id=formulario_id,
+        preguntas=tuple(PreguntaCompilada(*fila) for fila in sorted(preguntas)),
+    )
+
+
+def esquema_pregunta(pregunta):
+    """Esquema con una sola pregunta, para validar una respuesta aislada (p. ej. en el admin)."""
+    return EsquemaFormulario(
+        formulario_id=None,
+        preguntas=(PreguntaCompilada(pregunta.id, pregunta.tipo_pregunta, pregunta.es_obligatoria),),
+    )
+
+
+def _clave_version(formulario_id):
+    return f'{PREFIJO_CACHE}:{formulario_id}:version'
+
+
+def _version(formulario_id):
+    # Versiones aleatorias (no un contador): si la caché descarta la versión, la nueva nunca
+    # coincide con la de un esquema anterior que siga guardado
+    clave = _clave_version(formulario_id)
+    version = cache.get(clave)
+    if version is None:
+        cache.add(clave, uuid.uuid4().hex, None)
+        version = cache.get(clave)
+    return version
+
+
+def obtener_esquema(formulario_id):
+    """Devuelve el esquema del formulario desde la caché, compilándolo si hace falta."""
+    # La versión se lee antes de compilar: si el formulario cambia mientras tanto, el esquema
+    # compilado queda guardado con una versión que ya nadie consulta
+    clave = f'{PREFIJO_CACHE}:{formulario_id}:{_version(formulario_id)}'
+    esquema = cache.get(clave)
+    if esquema is None:
+        esquema = compilar_esquema(formulario_id)
+        cache.set(clave, esquema, TIMEOUT_CACHE)
+    return esquema
+
+
+def invalidar_esquemas(formulario_ids):
+    """Cambia la versión de los formularios una vez confirmada la transacción en curso."""
+    claves = [_clave_version(f) for f in set(formulario_ids)]
+    if claves:
+        transaction.on_commit(lambda: cache.set_many({c: uuid.uuid4().hex for c in claves}, None))
+
+
+@checks.register(checks.Tags.caches, deploy=True)
+def revisar_cache_compartida(app_configs, **kwargs):
+    backend = settings.CACHES.get('default', {}).get('BACKEND', '')
+    if backend.endswith('LocMemCache'):
+        return [checks.Warning(
+            "Los esquemas de validación se guardan en una caché local por proceso: con varios "
+            "workers, los cambios en formularios y preguntas no se ven en los demás procesos.",
+            hint="Configura CACHES['default'] con un backend compartido (Redis o Memcached).",
+            id='core_evaluacion.W001',
+        )]
+    return []
@@ -1,18 +1,29 @@
-from rest_framework import viewsets, permissions, status
+from rest_framework import viewsets, permissions, status, exceptions
 from rest_framework.response import Response
 from rest_framework.decorators import action
-from django.db.models import Avg, Count
+from rest_framework.parsers import MultiPartParser, FormParser
+from django.db.models import Count, prefetch_related_objects
 from django.db.models.functions import Coalesce
 
 from rest_framework import serializers # <--- Asegúrate de que esta línea esté presente y sea así.
 
-from .models import Profesor, Curso, Pregunta, FormularioEvaluacion, Evaluacion, Respuesta
+from .models import Profesor, Curso, Pregunta, FormularioEvaluacion, Evaluacion, Respuesta, promedio_calificaciones
 from .serializers import (
     ProfesorSerializer, CursoSerializer, PreguntaSerializer,
     FormularioEvaluacionSerializer, EvaluacionSerializer, RespuestaSerializer,
     UserSerializer
 )
 from django.contrib.auth.models import User
+from django.core.handlers.asgi import ASGIRequest
+from django.db import transaction
+from django.http import JsonResponse, StreamingHttpResponse
+import datetime
+import io
+
+from .eventos import canal_dashboard
+from .importacion import FORMATOS, IMPORTADORES, importar_archivo
+from .snapshot import COLUMNAS, OPERADORES, obtener_motor
+from .throttling import prioridad_envio, reporte_pesado
 
 # Permisos personalizados (ejemplo)
 class IsAdminOrReadOnly(permissions.BasePermission):
@@ -39,33 +50,75 @@ class IsStudentOrAdmin(permissions.BasePermission):
         return request.user and request.user.is_authenticated # Todos los autenticados pueden ver/crear
 
 
+class SnapshotNoDisponible(exceptions.APIException):
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = 'El snapshot de calificaciones aún no se ha construido (manage.py construir_snapshot).'
+    default_code = 'snapshot_no_disponible'
+
+
+def _motor_snapshot(request, requerido=False):
+    """
+    Devuelve el motor del snapshot columnar si la petición lo pide con `?motor=snapshot`
+    (o si `requerido` es True). Devuelve None cuando se debe consultar la base de datos.
+    """
+    if not requerido and request.query_params.get('motor') != 'snapshot':
+        return None
+    motor = obtener_motor()
+    if motor is None:
+        raise SnapshotNoDisponible()
+    return motor
+
+
 class ProfesorViewSet(viewsets.ModelViewSet):
     queryset = Profesor.objects.all()
     serializer_class = ProfesorSerializer
     # Permiso: los administradores pueden editar, los usuarios autenticados pueden ver
     permission_classes = [IsAdminOrReadOnly]
+    throttle_scope = None # Las acciones de reportes lo cambian a 'reportes' (ver throttling.py)
 
-    @action(detail=True, methods=['get'], permission_classes=[permissions.IsAuthenticated])
+    @action(detail=True, methods=['get'], permission_classes=[permissions.IsAuthenticated], throttle_scope='reportes')
     def promedio_calificacion(self, request, pk=None):
         """
         Calcula el promedio de calificaciones de un profesor específico.
         """
         profesor = self.get_object()
+        motor = _motor_snapshot(request)
+        if motor is not None:
+            filas = motor.agregar(filtros={'profesor_id': profesor.id})
+            avg_rating = filas[0]['promedio'] if filas else 0.0
+            return Response({'profesor_id': pk, 'promedio_calificacion': round(avg_rating, 2)})
+
         # Calcula el promedio de todas las respuestas de calificacion dadas al profesor
         # Coalesce(Avg(...), 0.0) asegura que si no hay calificaciones, el resultado sea 0.0 en lugar de None
         avg_rating = profesor.evaluaciones_recibidas.aggregate(
-            avg_calificacion=Coalesce(Avg('respuestas__respuesta_calificacion'), 0.0)
+            avg_calificacion=Coalesce(promedio_calificaciones('respuestas'), 0.0)
         )['avg_calificacion']
         return Response({'profesor_id': pk, 'promedio_calificacion': round(avg_rating, 2)})
 
-    @action(detail=False, methods=['get'], permission_classes=[permissions.IsAdminUser])
+    @action(detail=False, methods=['get'], permission_classes=[permissions.IsAdminUser], throttle_scope='reportes')
+    @reporte_pesado
     def estadisticas_generales(self, request):
         """
         Muestra estadísticas generales de todos los profesores (solo para admin).
+        Con ?motor=snapshot se calcula desde el snapshot de calificaciones (periodos cerrados);
+        en ese caso `num_evaluaciones` solo cuenta las evaluaciones con al menos una
+        calificación enviadas antes del corte, no todas las evaluaciones del profesor.
         """
+        motor = _motor_snapshot(request)
+        if motor is not None:
+            por_profesor = {fila['profesor_id']: fila for fila in motor.agregar(agrupar_por=['profesor_id'])}
+            estadisticas = []
+            # El snapshot solo tiene calificaciones: las evaluaciones sin ellas no se cuentan
+            for profesor in Profesor.objects.values('id', 'usuario__first_name', 'usuario__last_name'):
+                fila = por_profesor.get(profesor['id'], {})
+                profesor['num_evaluaciones'] = fila.get('total_evaluaciones', 0)
+                profesor['promedio_general'] = fila.get('promedio', 0.0)
+                estadisticas.append(profesor)
+            return Response(estadisticas)
+
         estadisticas = Profesor.objects.annotate(
             num_evaluaciones=Count('evaluaciones_recibidas', distinct=True),
-            promedio_general=Coalesce(Avg('evaluaciones_recibidas__respuestas__respuesta_calificacion'), 0.0)
+            promedio_general=Coalesce(promedio_calificaciones('evaluaciones_recibidas__respuestas'), 0.0)
         ).values('id', 'usuario__first_name', 'usuario__last_name', 'num_evaluaciones', 'promedio_general')
         return Response(list(estadisticas))
 
@@ -103,6 +156,7 @@ class EvaluacionViewSet(viewsets.ModelViewSet):
     queryset = Evaluacion.objects.all()
     serializer_class = EvaluacionSerializer
     permission_classes = [IsStudentOrAdmin] # Ver clase de permiso personalizada
+    throttle_scope = None # 'envios' al crear y 'reportes' en las acciones de reportes (ver throttling.py)
 
     def get_queryset(self):
         """
@@ -110,10 +164,22 @@ class EvaluacionViewSet(viewsets.ModelViewSet):
         los administradores pueden ver todas.
         """
         user = self.request.user
+        # Las respuestas leen su pregunta y su contenido de texto/selección (ver Respuesta)
+        queryset = Evaluacion.objects.prefetch_related('respuestas__pregunta', 'respuestas__contenido')
         if user.is_staff: # Si es admin, ve todas
-            return Evaluacion.objects.all()
+            return queryset
         # Si es un usuario regular, ve solo sus propias evaluaciones
-        return Evaluacion.objects.filter(estudiante=user)
+        return queryset.filter(estudiante=user)
+
+    def get_throttles(self):
+        # Los envíos de evaluaciones usan su propio ámbito, separado de lecturas y reportes
+        if self.action == 'create':
+            self.throttle_scope = 'envios'
+        return super().get_throttles()
+
+    @prioridad_envio
+    def create(self, request, *args, **kwargs):
+        return super().create(request, *args, **kwargs)
 
     def perform_create(self, serializer):
         """
@@ -133,7 +199,18 @@ class EvaluacionViewSet(viewsets.ModelViewSet):
         ).exists():
             raise serializers.ValidationError("Ya has enviado una evaluación para este profesor y curso con este formulario.")
 
-        serializer.save(estudiante=estudiante)
+        evaluacion = serializer.save(estudiante=estudiante)
+        # La respuesta serializa pregunta y contenido de cada respuesta: se cargan en bloque, como en get_queryset
+        prefetch_related_objects([evaluacion], 'respuestas__pregunta', 'respuestas__contenido')
+
+        # Notifica a los dashboards conectados una vez confirmada la transacción
+        calificaciones = [
+            r['respuesta_calificacion'] for r in serializer.validated_data['respuestas']
+            if r.get('respuesta_calificacion') is not None
+        ]
+        transaction.on_commit(lambda: canal_dashboard.publicar_evaluacion(
+            evaluacion.id, profesor.id, curso.id, calificaciones
+        ))
 
     @action(detail=False, methods=['get'])
     def mis_evaluaciones(self, request):
@@ -156,12 +233,19 @@ class EvaluacionViewSet(viewsets.ModelViewSet):
         serializer = EvaluacionSerializer(evaluacion) # Reutilizamos el serializador principal
         return Response(serializer.data)
 
-    @action(detail=False, methods=['get'], permission_classes=[permissions.IsAdminUser])
+    @action(detail=False, methods=['get'], permission_classes=[permissions.IsAdminUser], throttle_scope='reportes')
+    @reporte_pesado
     def reportes_generales(self, request):
         """
         Genera reportes generales de evaluaciones (solo para admin).
         Podrías expandir esto para generar PDFs, CSVs, etc.
+        Con ?motor=snapshot se calcula desde el snapshot de calificaciones (periodos cerrados);
+        los totales de evaluaciones solo cuentan las que tienen calificaciones.
         """
+        motor = _motor_snapshot(request)
+        if motor is not None:
+            return Response(self._reportes_desde_snapshot(motor))
+
         # Ejemplo: Contar cuantas evaluaciones ha recibido cada profesor
         reporte_profesores = Profesor.objects.annotate(
             total_evaluaciones=Count('evaluaciones_recibidas', distinct=True)
@@ -169,11 +253,111 @@ class EvaluacionViewSet(viewsets.ModelViewSet):
 
         # Ejemplo: Promedio de calificacion por curso
         reporte_cursos = Curso.objects.annotate(
-            promedio_calificacion_curso=Coalesce(Avg('evaluaciones_curso__respuestas__respuesta_calificacion'), 0.0),
+            promedio_calificacion_curso=Coalesce(promedio_calificaciones('evaluaciones_curso__respuestas'), 0.0),
             total_evaluaciones_curso=Count('evaluaciones_curso', distinct=True)
         ).values('nombre', 'codigo', 'promedio_calificacion_curso', 'total_evaluaciones_curso')
 
         return Response({
             'reporte_profesores': list(reporte_profesores),
             'reporte_cursos': list(reporte_cursos)
-        })
\ No newline at end of file
+        })
+
+    def _reportes_desde_snapshot(self, motor):
+        # Como en estadisticas_generales, los totales solo cuentan evaluaciones con calificaciones
+        por_profesor = {fila['profesor_id']: fila for fila in motor.agregar(agrupar_por=['profesor_id'])}
+        por_curso = {fila['curso_id']: fila for fila in motor.agregar(agrupar_por=['curso_id'])}
+
+        reporte_profesores = []
+        for profesor in Profesor.objects.values('id', 'usuario__first_name', 'usuario__last_name'):
+            fila = por_profesor.get(profesor.pop('id'), {})
+            profesor['total_evaluaciones'] = fila.get('total_evaluaciones', 0)
+            reporte_profesores.append(profesor)
+
+        reporte_cursos = []
+        for curso in Curso.objects.values('id', 'nombre', 'codigo'):
+            fila = por_curso.get(curso.pop('id'), {})
+            curso['promedio_calificacion_curso'] = fila.get('promedio', 0.0)
+            curso['total_evaluaciones_curso'] = fila.get('total_evaluaciones', 0)
+            reporte_cursos.append(curso)
+
+        return {
+            'reporte_profesores': reporte_profesores,
+            'reporte_cursos': reporte_cursos,
+            'snapshot_hasta': motor.hasta,
+        }
+
+    @action(detail=False, methods=['get'], permission_classes=[permissions.IsAdminUser], throttle_scope='reportes')
+    @reporte_pesado
+    def analisis(self, request):
+        """
+        Agregaciones ad-hoc sobre el snapshot de calificaciones (solo para admin).
+        Ejemplo: ?agrupar_por=curso_id,dia&profesor_id=3&dia__gte=2025-03-01&pregunta_id__in=1,2
+        """
+        motor = _motor_snapshot(request, requerido=True)
+        agrupar_por = [c for c in request.query_params.get('agrupar_por', '').split(',') if c]
+        filtros = {}
+        try:
+            for clave, valor in request.query_params.items():
+                if clave in ('agrupar_por', 'motor', 'format'):
+                    continue
+                columna, _, operador = clave.partition('__')
+                if columna not in COLUMNAS or (operador or 'exact') not in OPERADORES:
+                    raise ValueError(f"Filtro no soportado: {clave}")
+                convertir = datetime.date.fromisoformat if columna == 'dia' else int
+                filtros[clave] = [convertir(v) for v in valor.split(',')] if operador == 'in' else convertir(valor)
+            resultado = motor.agregar(agrupar_por=agrupar_por, filtros=filtros)
+        except (ValueError, OverflowError) as e:
+            return Response({'detail': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({'snapshot_hasta': motor.hasta, 'resultados': resultado})
+
+
+class ImportacionViewSet(viewsets.ViewSet):
+    """
+    Carga masiva de profesores, cursos, preguntas o formularios (solo para admin).
+    Recibe un archivo CSV o JSON Lines en el campo `archivo` y los campos `tipo` y `formato`.
+    """
+    permission_classes = [permissions.IsAdminUser]
+    parser_classes = [MultiPartParser, FormParser]
+
+    def create(self, request):
+        tipo = request.data.get('tipo')
+        archivo = request.FILES.get('archivo')
+        formato = request.data.get('formato') or ('csv' if archivo and archivo.name.lower().endswith('.csv') else 'json')
+
+        if tipo not in IMPORTADORES:
+            return Response({'tipo': f"Debe ser uno de: {', '.join(IMPORTADORES)}."}, status=status.HTTP_400_BAD_REQUEST)
+        if formato not in FORMATOS:
+            return Response({'formato': f"Debe ser uno de: {', '.join(FORMATOS)}."}, status=status.HTTP_400_BAD_REQUEST)
+        if archivo is None:
+            return Response({'archivo': 'Debes adjuntar un archivo.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        # Se lee el archivo subido como flujo de texto, sin cargarlo completo en memoria
+        texto = io.TextIOWrapper(archivo.open('rb'), encoding='utf-8-sig', newline='')
+        try:
+            resultado = importar_archivo(texto, tipo, formato)
+        except UnicodeDecodeError:
+            return Response({'archivo': 'El archivo debe estar codificado en UTF-8.'}, status=status.HTTP_400_BAD_REQUEST)
+        finally:
+            texto.detach()
+
+        codigo = status.HTTP_200_OK if resultado.total_errores == 0 else status.HTTP_207_MULTI_STATUS
+        return Response(resultado.como_dict(), status=codigo)
+
+
+# Vista asíncrona de Django (DRF no soporta vistas asíncronas), autenticada por sesión
+async def dashboard_eventos(request):
+    """
+    Feed SSE para el dashboard de coordinadores (solo para admin). Envía un evento `estado`
+    con los totales actuales y luego un evento `evaluacion` por cada evaluación creada.
+    Requiere servir la aplicación por ASGI (evaluacion_docente_backend.asgi).
+    """
+    usuario = await request.auser()
+    if not usuario.is_staff:
+        return JsonResponse({'detail': 'No tienes permiso para realizar esta acción.'}, status=403)
+    if not isinstance(request, ASGIRequest):
+        return JsonResponse({'detail': 'El feed en vivo requiere servir la aplicación por ASGI.'}, status=501)
+
+    respuesta = StreamingHttpResponse(canal_dashboard.flujo(), content_type='text/event-stream')
+    respuesta['Cache-Control'] = 'no-cache'
+    respuesta['X-Accel-Buffering'] = 'no' # Evita que un proxy nginx acumule los eventos
+    return respuesta
\ No newline at end of file
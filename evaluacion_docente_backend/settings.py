@@ -130,6 +130,15 @@ STATIC_URL = 'static/'
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
+# Caché de los esquemas de validación de formularios (core_evaluacion/validacion.py).
+# LocMemCache es por proceso: en producción, con varios workers, usa un backend compartido, p. ej.
+# {'BACKEND': 'django.core.cache.backends.redis.RedisCache', 'LOCATION': 'redis://127.0.0.1:6379'}
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+
 # Django REST Framework settings
 REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': [
@@ -139,8 +148,30 @@ REST_FRAMEWORK = {
         'rest_framework.authentication.SessionAuthentication',
         'rest_framework.authentication.TokenAuthentication', # Para APIs sin sesión de navegador
     ],
+    # Límites por usuario y por ámbito (token bucket en memoria, ver core_evaluacion/throttling.py)
+    'DEFAULT_THROTTLE_CLASSES': [
+        'core_evaluacion.throttling.TokenBucketThrottle',
+    ],
+    'DEFAULT_THROTTLE_RATES': {
+        'envios': '20/min',   # Envío de evaluaciones
+        'reportes': '6/min',  # Reportes y estadísticas
+        'lectura': '120/min', # Resto de peticiones GET
+    },
+    # Proxies inversos delante de la aplicación. Con 0 los anónimos se identifican por REMOTE_ADDR
+    # y se ignora X-Forwarded-For, que el cliente puede falsificar
+    'NUM_PROXIES': 0,
+}
+
+# Control de admisión: los envíos de evaluaciones tienen prioridad sobre los reportes pesados
+CONTROL_ADMISION = {
+    'REPORTES_MAX_CONCURRENTES': 2, # Reportes pesados ejecutándose a la vez por proceso
+    'UMBRAL_ENVIOS_PRIORIDAD': 20,  # Con esta cantidad de envíos en curso se rechazan los reportes
+    'RETRY_AFTER': 5,               # Segundos sugeridos en la cabecera Retry-After
 }
 
+# Snapshot columnar de calificaciones (manage.py construir_snapshot, requiere numpy)
+SNAPSHOT_CALIFICACIONES_DIR = BASE_DIR / 'snapshot_calificaciones'
+
 # CORS_HEADERS settings (para desarrollo local)
 CORS_ALLOW_ALL_ORIGINS = True # Permite solicitudes de cualquier origen. ¡Cámbialo en producción!
 # O de forma más específica si sabes de dónde vendrá tu frontend: